@@ -1,42 +1,166 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, has_app_context, Response, stream_with_context
 import os
+import zlib
 import sqlite3
 import json
+import base64
+import hashlib
 from werkzeug.utils import secure_filename
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
+import time
+import socket
+from collections import OrderedDict, deque
+import tempfile
+import queue
+import threading
+import zipfile
+import mimetypes
+import cProfile
+import pstats
+import io
+import marshal
+import hmac
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process does maintenance.
+    fcntl = None
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 from flask_cors import CORS
-from urllib import request as urllib_request
 from urllib import parse as urllib_parse
-from urllib.error import HTTPError, URLError
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
-from resume_extractor import extract_resume_info, ResumeExtractionError
+from langchain_community.callbacks import get_openai_callback
+from resume_extractor import (
+    extract_resume_info,
+    extract_resume_info_from_text,
+    estimate_tokens,
+    extract_text_from_file,
+    extraction_cache,
+    normalize_text,
+    ExtractionCache,
+    ResumeExtractionError,
+    RESUME_EXTRACTION_MODE,
+    TEXT_TIMEOUT,
+    TEXT_WORKERS,
+)
+from telegram_client import TelegramClient, TelegramFileTooLarge
+from document_store import BlobStore
+from metrics import registry, DB_BUCKETS, OPENAI_REQUEST_SECONDS, record_openai_usage
+from tracing import bind_context, make_exporter, tracer
+from document_recognizer import (
+    KIND_AADHAAR,
+    KIND_DONE,
+    KIND_GREETING,
+    KIND_INVALID_AADHAAR,
+    KIND_INVALID_PAN,
+    KIND_PAN,
+    KIND_THANKS,
+    KIND_WHERE_TO_SEND,
+    recognize_message,
+)
 
 load_dotenv()
 
 app = Flask(__name__)
 
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['ETag', 'Last-Modified', 'Link', 'X-Next-Cursor', 'Content-Range', 'Accept-Ranges'])  # Enable CORS for all routes
 
 # Configuration from environment variables
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
 app.config['DEBUG'] = os.environ.get('DEBUG', 'True').lower() == 'true'
 DATABASE = os.environ.get('DATABASE', 'database.db')
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
 UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
+DOCUMENT_CACHE_MAX_AGE = int(os.environ.get('DOCUMENT_CACHE_MAX_AGE', 31536000))
+DOCUMENT_OFFLOAD = os.environ.get('DOCUMENT_OFFLOAD', '').lower()
+DOCUMENT_ACCEL_PREFIX = os.environ.get('DOCUMENT_ACCEL_PREFIX', '/protected-uploads/')
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_API_TOKEN') or os.environ.get('TELEGRAM_API_KEY')
 TELEGRAM_WEBHOOK_SECRET = os.environ.get('TELEGRAM_WEBHOOK_SECRET', '')
 PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+TELEGRAM_API_BASE_URL = os.environ.get('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', 8))
+TELEGRAM_TIMEOUT = float(os.environ.get('TELEGRAM_TIMEOUT', 20))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', 3))
+TELEGRAM_MAX_FILE_BYTES = int(os.environ.get('TELEGRAM_MAX_FILE_BYTES', 20 * 1024 * 1024))
+RESUME_INGESTION_MODE = os.environ.get('RESUME_INGESTION_MODE', 'sync').lower()
+INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 4))
+INGESTION_MAX_PENDING = int(os.environ.get('INGESTION_MAX_PENDING', 100))
+BULK_MAX_FILES = int(os.environ.get('BULK_MAX_FILES', 500))
+BULK_MAX_FILE_BYTES = int(os.environ.get('BULK_MAX_FILE_BYTES', 20 * 1024 * 1024))
+BULK_LLM_CONCURRENCY = int(os.environ.get('BULK_LLM_CONCURRENCY', 8))
+BULK_INSERT_BATCH_SIZE = int(os.environ.get('BULK_INSERT_BATCH_SIZE', 50))
+CHANGE_LOG_RETENTION_SECONDS = int(os.environ.get('CHANGE_LOG_RETENTION_SECONDS', 7 * 24 * 3600))
+CHANGE_STREAM_POLL_SECONDS = float(os.environ.get('CHANGE_STREAM_POLL_SECONDS', 2))
+CHANGE_STREAM_MAX_SECONDS = int(os.environ.get('CHANGE_STREAM_MAX_SECONDS', 300))
+TELEGRAM_UPDATE_MODE = os.environ.get('TELEGRAM_UPDATE_MODE', 'async').lower()
+TELEGRAM_WORKERS = int(os.environ.get('TELEGRAM_WORKERS', 4))
+TELEGRAM_QUEUE_SIZE = int(os.environ.get('TELEGRAM_QUEUE_SIZE', 1000))
+TELEGRAM_UPDATE_RETENTION_SECONDS = int(os.environ.get('TELEGRAM_UPDATE_RETENTION_SECONDS', 2 * 24 * 3600))
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('MAINTENANCE_INTERVAL_SECONDS', 3600))
+WORK_LEASE_SECONDS = int(os.environ.get('WORK_LEASE_SECONDS', 300))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get('SESSION_CACHE_TTL_SECONDS', 3600))
+AGENT_HISTORY_TURNS = int(os.environ.get('AGENT_HISTORY_TURNS', 20))
+AGENT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('AGENT_CONTEXT_TOKEN_BUDGET', 600))
+AGENT_SUMMARY_TRIGGER_TOKENS = int(os.environ.get('AGENT_SUMMARY_TRIGGER_TOKENS', 400))
+AGENT_SUMMARY_MAX_TOKENS = int(os.environ.get('AGENT_SUMMARY_MAX_TOKENS', 150))
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', '').lower()
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces.jsonl')
+TRACE_SAMPLE_RATIO = float(os.environ.get('TRACE_SAMPLE_RATIO', 0.1))
+PROFILE_ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN', '')
+PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', 20))
+PROFILE_TOP_FUNCTIONS = int(os.environ.get('PROFILE_TOP_FUNCTIONS', 50))
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+DB_SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('DB_SLOW_QUERY_BUFFER_SIZE', 100))
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+blob_store = BlobStore(UPLOAD_FOLDER)
+tracer.configure(make_exporter(TRACE_EXPORTER, TRACE_FILE), TRACE_SAMPLE_RATIO)
 
 SESSION_STAGE_DONE = 'done'
 SESSION_STAGE_PAN = 'pan'
 SESSION_STAGE_AADHAAR = 'aadhaar'
 
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_EXTRACTING = 'extracting'
+JOB_STATUS_SAVED = 'saved'
+JOB_STATUS_FAILED = 'failed'
+
+UPDATE_STATUS_QUEUED = 'queued'
+UPDATE_STATUS_PROCESSING = 'processing'
+UPDATE_STATUS_PROCESSED = 'processed'
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status')
+)
+SQLITE_QUERY_SECONDS = registry.histogram(
+    'sqlite_query_duration_seconds', 'SQLite statement latency by operation.', ('operation',), DB_BUCKETS
+)
+TELEGRAM_API_SECONDS = registry.histogram(
+    'telegram_api_duration_seconds', 'Telegram Bot API call latency by method.', ('method', 'outcome')
+)
+TELEGRAM_UPDATES_PROCESSED = registry.counter(
+    'telegram_updates_processed_total', 'Telegram updates processed, by outcome.', ('outcome',)
+)
+EXTRACTION_FAILURES = registry.counter(
+    'resume_extraction_failures_total', 'Failed resume ingestions by stage.', ('stage',)
+)
+SQL_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH', 'CREATE', 'ALTER', 'PRAGMA'}
+EXPLAINABLE_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH'}
+
+request_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+slow_queries = deque(maxlen=DB_SLOW_QUERY_BUFFER_SIZE)
+
 
 def candidate_display_name(candidate):
     name = ''
@@ -118,11 +242,229 @@ def home():
     </html>
     """
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
+def sql_operation(sql):
+    words = sql.lstrip()[:16].split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in SQL_OPERATIONS else 'OTHER'
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection that records statement latency in sqlite_query_duration_seconds.
+
+    Statements slower than DB_SLOW_QUERY_MS are also logged with their
+    ``EXPLAIN QUERY PLAN``. Only the execute call is timed, so rows fetched
+    afterwards are not included.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.record_query(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # The parameter sequence may be a consumed iterator, so no plan is taken.
+            self.record_query(sql, None, time.perf_counter() - started)
+
+    def record_query(self, sql, parameters, elapsed):
+        operation = sql_operation(sql)
+        SQLITE_QUERY_SECONDS.observe(elapsed, operation=operation)
+        if DB_SLOW_QUERY_MS > 0 and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            self.log_slow_query(sql, parameters, operation, elapsed)
+
+    def log_slow_query(self, sql, parameters, operation, elapsed):
+        plan = []
+        if parameters is not None and operation in EXPLAINABLE_OPERATIONS:
+            try:
+                plan = [row[3] for row in super().execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+            except sqlite3.Error as exc:
+                plan = [f'unavailable: {exc}']
+        entry = {
+            'recorded_at': datetime.now().isoformat(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'operation': operation,
+            'sql': ' '.join(sql.split()),
+            'plan': plan,
+        }
+        slow_queries.append(entry)
+        print(f"Slow query ({entry['duration_ms']} ms): {entry['sql']} | plan: {'; '.join(plan) or 'n/a'}")
+
+
+def connect_db():
+    conn = sqlite3.connect(
+        DATABASE,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=InstrumentedConnection,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+db_local = threading.local()
+
+
+def acquire_db():
+    try:
+        return db_pool.get_nowait()
+    except queue.Empty:
+        return connect_db()
+
+
+def release_db(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def get_db():
+    """Return a reused connection; use it as ``with get_db() as conn:`` for a transaction.
+
+    Requests borrow one pooled connection for their whole lifetime and hand it
+    back on teardown. Background workers keep a connection per thread.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = acquire_db()
+        return g.db
+    conn = getattr(db_local, 'conn', None)
+    if conn is None:
+        conn = db_local.conn = connect_db()
     return conn
 
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+        )
+    return response
+
+
+def profile_token_matches(token):
+    return bool(PROFILE_ADMIN_TOKEN and token) and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+@app.before_request
+def start_profiler():
+    # Opt-in per request: X-Profile-Token header or ?profile=<token>.
+    if not PROFILE_ADMIN_TOKEN or request.path.startswith('/admin/'):
+        return
+    if not profile_token_matches(request.headers.get('X-Profile-Token') or request.args.get('profile', '')):
+        return
+    g.profile_started = time.perf_counter()
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+@app.after_request
+def stop_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    duration = time.perf_counter() - g.pop('profile_started')
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    profile_id = uuid.uuid4().hex
+    request_profiles.append({
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'recorded_at': now_iso(),
+        'report': report.getvalue(),
+        'pstats': marshal.dumps(stats.stats),
+    })
+    response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+def require_profile_admin():
+    if not PROFILE_ADMIN_TOKEN:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    if not profile_token_matches(request.headers.get('X-Profile-Token', '')):
+        return jsonify({'error': 'Invalid profile token'}), 403
+    return None
+
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_request_profiles():
+    denied = require_profile_admin()
+    if denied:
+        return denied
+    profiles = [
+        {key: value for key, value in profile.items() if key not in ('report', 'pstats')}
+        for profile in reversed(list(request_profiles))
+    ]
+    return jsonify({'profiles': profiles}), 200
+
+
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_request_profile(profile_id):
+    denied = require_profile_admin()
+    if denied:
+        return denied
+    profile = next((p for p in list(request_profiles) if p['id'] == profile_id), None)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'pstats':
+        return Response(
+            profile['pstats'],
+            mimetype='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename={profile_id}.prof'},
+        )
+    return Response(profile['report'], mimetype='text/plain')
+
+
+@app.route('/admin/slow-queries', methods=['GET'])
+def list_slow_queries():
+    denied = require_profile_admin()
+    if denied:
+        return denied
+    return jsonify({'threshold_ms': DB_SLOW_QUERY_MS, 'queries': list(reversed(list(slow_queries)))}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.teardown_appcontext
+def teardown_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None:
+        release_db(conn)
+
+
 def init_db():
     with get_db() as conn:
         conn.execute('''CREATE TABLE IF NOT EXISTS candidates (
@@ -135,7 +477,10 @@ def init_db():
             skills TEXT,
             company_history TEXT,
             resume_path TEXT,
-            telegram_username TEXT
+            telegram_username TEXT,
+            phone_normalized TEXT,
+            telegram_username_normalized TEXT,
+            resume_sha256 TEXT
         )''')
         conn.execute('''CREATE TABLE IF NOT EXISTS documents (
             id TEXT PRIMARY KEY,
@@ -143,8 +488,16 @@ def init_db():
             type TEXT,
             path TEXT,
             status TEXT DEFAULT 'pending',
+            sha256 TEXT,
             FOREIGN KEY (candidate_id) REFERENCES candidates(id)
         )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER,
+            mime_type TEXT,
+            refcount INTEGER,
+            created_at TEXT
+        )''')
         conn.execute('''CREATE TABLE IF NOT EXISTS requests (
             id TEXT PRIMARY KEY,
             candidate_id TEXT,
@@ -162,8 +515,103 @@ def init_db():
             candidate_id TEXT,
             stage TEXT,
             history TEXT,
+            summary TEXT,
+            summary_seq INTEGER DEFAULT 0,
             updated_at TEXT
         )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS telegram_messages (
+            chat_id TEXT,
+            seq INTEGER,
+            speaker TEXT,
+            text TEXT,
+            created_at TEXT,
+            PRIMARY KEY (chat_id, seq)
+        ) WITHOUT ROWID''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            stage TEXT,
+            error TEXT,
+            file_path TEXT,
+            filename TEXT,
+            candidate_id TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            lease_owner TEXT,
+            lease_expires_at INTEGER
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS telegram_updates (
+            update_id INTEGER PRIMARY KEY,
+            chat_id TEXT,
+            payload TEXT,
+            status TEXT,
+            received_at INTEGER,
+            lease_owner TEXT,
+            lease_expires_at INTEGER
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER,
+            updated_at INTEGER
+        )''')
+        conn.execute(
+            "INSERT OR IGNORE INTO table_versions (name, version, updated_at) "
+            "VALUES ('candidates', 0, CAST(strftime('%s', 'now') AS INTEGER))"
+        )
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_candidates_version_{event.lower()}
+                AFTER {event} ON candidates
+                BEGIN
+                    UPDATE table_versions
+                    SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                    WHERE name = 'candidates';
+                END''')
+        for column in ('name', 'email', 'company', 'designation'):
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_candidates_sort_{column} ON candidates(COALESCE({column}, ''))"
+            )
+        conn.execute('''CREATE TABLE IF NOT EXISTS candidate_skills (
+            skill TEXT,
+            candidate_id TEXT,
+            PRIMARY KEY (skill, candidate_id)
+        ) WITHOUT ROWID''')
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_candidate_skills_candidate ON candidate_skills(candidate_id)'
+        )
+        conn.execute('''CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT,
+            entity_id TEXT,
+            candidate_id TEXT,
+            op TEXT,
+            changed_at INTEGER
+        )''')
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_candidates_change_{event.lower()}
+                AFTER {event} ON candidates
+                BEGIN
+                    INSERT INTO change_log (entity, entity_id, candidate_id, op, changed_at)
+                    VALUES ('candidate', {row}.id, {row}.id, '{event.lower()}', CAST(strftime('%s', 'now') AS INTEGER));
+                END''')
+        for event, row in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_documents_change_{event.lower()}
+                AFTER {event} ON documents
+                BEGIN
+                    INSERT INTO change_log (entity, entity_id, candidate_id, op, changed_at)
+                    VALUES ('document', {row}.id, {row}.candidate_id, '{event.lower()}', CAST(strftime('%s', 'now') AS INTEGER));
+                END''')
+
+def normalize_contact(value):
+    if not value:
+        return ''
+    text = str(value).strip()
+    if text.startswith('@'):
+        return text[1:].lower()
+    digits = re.sub(r'[^0-9]', '', text)
+    if len(digits) >= 7:
+        return digits
+    return text.lower()
+
 
 def ensure_candidate_columns():
     with get_db() as conn:
@@ -175,10 +623,156 @@ def ensure_candidate_columns():
             conn.execute(
                 "ALTER TABLE candidates ADD COLUMN company_history TEXT DEFAULT '[]'"
             )
+        if "phone_normalized" not in columns:
+            conn.execute("ALTER TABLE candidates ADD COLUMN phone_normalized TEXT")
+        if "telegram_username_normalized" not in columns:
+            conn.execute("ALTER TABLE candidates ADD COLUMN telegram_username_normalized TEXT")
+        if "resume_sha256" not in columns:
+            conn.execute("ALTER TABLE candidates ADD COLUMN resume_sha256 TEXT")
+        if "resume_text_sha256" not in columns:
+            conn.execute("ALTER TABLE candidates ADD COLUMN resume_text_sha256 TEXT")
+
+        # Backfill identity lookup columns with the same rules as normalize_contact.
+        rows = conn.execute(
+            "SELECT id, phone, telegram_username FROM candidates "
+            "WHERE phone_normalized IS NULL OR telegram_username_normalized IS NULL"
+        ).fetchall()
+        if rows:
+            conn.executemany(
+                "UPDATE candidates SET phone_normalized = ?, telegram_username_normalized = ? WHERE id = ?",
+                [(normalize_contact(r["phone"]), normalize_contact(r["telegram_username"]), r["id"]) for r in rows]
+            )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_candidates_phone_normalized ON candidates(phone_normalized)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_candidates_telegram_username_normalized "
+            "ON candidates(telegram_username_normalized)"
+        )
+
+
+def ensure_document_columns():
+    with get_db() as conn:
+        columns = {
+            row["name"]
+            for row in conn.execute("PRAGMA table_info(documents)").fetchall()
+        }
+        if "sha256" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN sha256 TEXT")
+
+
+def ensure_session_columns():
+    with get_db() as conn:
+        columns = {
+            row["name"]
+            for row in conn.execute("PRAGMA table_info(telegram_sessions)").fetchall()
+        }
+        if "summary" not in columns:
+            conn.execute("ALTER TABLE telegram_sessions ADD COLUMN summary TEXT")
+        if "summary_seq" not in columns:
+            conn.execute("ALTER TABLE telegram_sessions ADD COLUMN summary_seq INTEGER DEFAULT 0")
+
+
+def ensure_lease_columns():
+    with get_db() as conn:
+        for table in ('ingestion_jobs', 'telegram_updates'):
+            columns = {
+                row["name"]
+                for row in conn.execute(f"PRAGMA table_info({table})").fetchall()
+            }
+            if "lease_owner" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN lease_owner TEXT")
+            if "lease_expires_at" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN lease_expires_at INTEGER")
+
+
+def canonical_skill(value):
+    return normalize_text(str(value)).lower()
+
+
+def candidate_skill_rows(candidate_id, skills):
+    return [(skill, candidate_id) for skill in {canonical_skill(v) for v in skills or []} if skill]
+
+
+def backfill_candidate_skills():
+    with get_db() as conn:
+        rows = conn.execute(
+            'SELECT id, skills FROM candidates c '
+            'WHERE skills IS NOT NULL AND skills != \'[]\' '
+            'AND NOT EXISTS (SELECT 1 FROM candidate_skills cs WHERE cs.candidate_id = c.id)'
+        ).fetchall()
+        for row in rows:
+            try:
+                skills = json.loads(row['skills'])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(skills, list):
+                conn.executemany(
+                    'INSERT OR IGNORE INTO candidate_skills (skill, candidate_id) VALUES (?, ?)',
+                    candidate_skill_rows(row['id'], skills)
+                )
+
+
+SESSION_SPEAKERS = ('User', 'Mr Traqchecker')
+
+
+def parse_history_lines(history):
+    """Split a legacy history transcript into (speaker, text) turns."""
+    turns = []
+    for line in (history or '').split('\n'):
+        speaker, separator, text = line.partition(': ')
+        if speaker in SESSION_SPEAKERS and separator:
+            turns.append([speaker, text])
+        elif turns:
+            turns[-1][1] += '\n' + line
+        elif line.strip():
+            turns.append(['User', line])
+    return turns
+
+
+def migrate_session_history():
+    """Move legacy telegram_sessions.history transcripts into telegram_messages."""
+    with get_db() as conn:
+        sessions = conn.execute(
+            "SELECT chat_id, history, updated_at FROM telegram_sessions WHERE history IS NOT NULL AND history != ''"
+        ).fetchall()
+        for session in sessions:
+            start = conn.execute(
+                'SELECT COALESCE(MAX(seq), 0) FROM telegram_messages WHERE chat_id = ?', (session['chat_id'],)
+            ).fetchone()[0]
+            conn.executemany(
+                'INSERT INTO telegram_messages (chat_id, seq, speaker, text, created_at) VALUES (?, ?, ?, ?, ?)',
+                [(session['chat_id'], start + index, speaker, text, session['updated_at'])
+                 for index, (speaker, text) in enumerate(parse_history_lines(session['history']), start=1)]
+            )
+            conn.execute("UPDATE telegram_sessions SET history = '' WHERE chat_id = ?", (session['chat_id'],))
+
+
+def prune_change_log():
+    with get_db() as conn:
+        conn.execute(
+            "DELETE FROM change_log WHERE changed_at < CAST(strftime('%s', 'now') AS INTEGER) - ?",
+            (CHANGE_LOG_RETENTION_SECONDS,)
+        )
+
+
+def prune_telegram_updates():
+    with get_db() as conn:
+        conn.execute(
+            'DELETE FROM telegram_updates WHERE status = ? AND received_at < CAST(strftime(\'%s\', \'now\') AS INTEGER) - ?',
+            (UPDATE_STATUS_PROCESSED, TELEGRAM_UPDATE_RETENTION_SECONDS)
+        )
 
 
 init_db()
 ensure_candidate_columns()
+ensure_document_columns()
+ensure_session_columns()
+ensure_lease_columns()
+backfill_candidate_skills()
+migrate_session_history()
+prune_change_log()
+prune_telegram_updates()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -194,49 +788,62 @@ def now_iso():
     return datetime.now().isoformat()
 
 
-def normalize_contact(value):
-    if not value:
-        return ''
-    text = str(value).strip()
-    if text.startswith('@'):
-        return text[1:].lower()
-    digits = re.sub(r'[^0-9]', '', text)
-    if len(digits) >= 7:
-        return digits
-    return text.lower()
-
-
 def is_numeric_chat_id(value):
     if value is None:
         return False
     return bool(re.fullmatch(r'-?\d{7,}', str(value).strip()))
 
 
+telegram_client = TelegramClient(
+    TELEGRAM_BOT_TOKEN,
+    base_url=TELEGRAM_API_BASE_URL,
+    pool_size=TELEGRAM_POOL_SIZE,
+    timeout=TELEGRAM_TIMEOUT,
+    max_retries=TELEGRAM_MAX_RETRIES,
+) if TELEGRAM_BOT_TOKEN else None
+
+
 def telegram_api_call(method, payload=None):
-    if not TELEGRAM_BOT_TOKEN:
+    if not telegram_client:
         raise RuntimeError('Telegram bot token is not configured')
-    payload = payload or {}
-    url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/{method}'
-    data = urllib_parse.urlencode(payload).encode('utf-8')
-    req = urllib_request.Request(url, data=data, method='POST')
-    with urllib_request.urlopen(req, timeout=20) as resp:
-        body = json.loads(resp.read().decode('utf-8'))
-    if not body.get('ok'):
-        raise RuntimeError(body.get('description', 'Telegram API request failed'))
-    return body.get('result')
-
-
-def telegram_get_file(file_id):
-    if not TELEGRAM_BOT_TOKEN:
+    with tracer.span(f'telegram.{method}'):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = telegram_client.call(method, payload)
+            outcome = 'ok'
+            return result
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method=method, outcome=outcome)
+
+
+def telegram_get_file_path(file_id):
+    if not telegram_client:
         raise RuntimeError('Telegram bot token is not configured')
     file_info = telegram_api_call('getFile', {'file_id': file_id})
     file_path = file_info.get('file_path')
     if not file_path:
         raise RuntimeError('Telegram file path not found')
-    url = f'https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}'
-    with urllib_request.urlopen(url, timeout=30) as resp:
-        content = resp.read()
-    return file_path, content
+    if (file_info.get('file_size') or 0) > TELEGRAM_MAX_FILE_BYTES:
+        raise TelegramFileTooLarge(f'File is larger than {TELEGRAM_MAX_FILE_BYTES} bytes')
+    return file_path
+
+
+@tracer.wrap('telegram.download')
+def telegram_download_file(file_path):
+    """Stream a Telegram file into a temp file in UPLOAD_FOLDER; returns (tmp_path, size, sha256)."""
+    fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], prefix='.telegram-', suffix='.part')
+    started = time.perf_counter()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            size, digest = telegram_client.download_to(file_path, f, max_bytes=TELEGRAM_MAX_FILE_BYTES)
+    except BaseException:
+        TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method='download', outcome='error')
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    TELEGRAM_API_SECONDS.observe(time.perf_counter() - started, method='download', outcome='ok')
+    return tmp_path, size, digest
 
 
 def telegram_send_message(chat_id, text):
@@ -248,21 +855,21 @@ def get_candidate_by_id(candidate_id):
         return conn.execute('SELECT * FROM candidates WHERE id = ?', (candidate_id,)).fetchone()
 
 
+@tracer.wrap('db.find_candidate_for_identity')
 def find_candidate_for_identity(identity, username=None):
     identity_normalized = normalize_contact(identity)
     username_normalized = normalize_contact(username)
     with get_db() as conn:
         if identity_normalized:
             candidate = conn.execute(
-                'SELECT * FROM candidates WHERE lower(replace(replace(replace(phone, "+", ""), "-", ""), " ", "")) = ? '
-                'OR lower(replace(telegram_username, "@", "")) = ?',
+                'SELECT * FROM candidates WHERE phone_normalized = ? OR telegram_username_normalized = ?',
                 (identity_normalized, identity_normalized)
             ).fetchone()
             if candidate:
                 return candidate
         if username_normalized:
             candidate = conn.execute(
-                'SELECT * FROM candidates WHERE lower(replace(telegram_username, "@", "")) = ?',
+                'SELECT * FROM candidates WHERE telegram_username_normalized = ?',
                 (username_normalized,)
             ).fetchone()
             if candidate:
@@ -270,6 +877,7 @@ def find_candidate_for_identity(identity, username=None):
     return None
 
 
+@tracer.wrap('db.get_candidate_by_chat_id')
 def get_candidate_by_chat_id(chat_id):
     with get_db() as conn:
         candidate = conn.execute(
@@ -305,45 +913,335 @@ def get_telegram_link_for_candidate(candidate_id):
         ).fetchone()
 
 
+class SessionStore:
+    """Write-through LRU cache in front of telegram_sessions.
+
+    Reads of active chats are served from memory; every write goes to SQLite
+    first and then refreshes the cached copy. Entries idle for longer than
+    ``ttl_seconds`` are reloaded from the database. Conversation turns are
+    appended to telegram_messages in the same transaction as the session row.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        # Token per chat whose row is being loaded; a write drops it so that
+        # load, which may have read the old row, is not cached.
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _cache(self, chat_id, session):
+        with self._lock:
+            self._entries[chat_id] = (session, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, chat_id):
+        chat_id = str(chat_id)
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            now = time.monotonic()
+            if entry and entry[1] > now:
+                # Sliding expiry: only chats idle for ttl_seconds are reloaded.
+                self._entries[chat_id] = (entry[0], now + self.ttl_seconds)
+                self._entries.move_to_end(chat_id)
+                return dict(entry[0])
+            self._entries.pop(chat_id, None)
+            token = self._loading[chat_id] = object()
+
+        try:
+            with get_db() as conn:
+                row = conn.execute(
+                    'SELECT chat_id, candidate_id, stage, summary, summary_seq FROM telegram_sessions WHERE chat_id = ?',
+                    (chat_id,)
+                ).fetchone()
+        finally:
+            with self._lock:
+                current = self._loading.get(chat_id) is token
+                if current:
+                    del self._loading[chat_id]
+        if not row:
+            return None
+        session = dict(row)
+        if current:
+            self._cache(chat_id, session)
+        return dict(session)
+
+    def save(self, chat_id, candidate_id, stage, messages=()):
+        """Upsert the session and append ``messages`` ((speaker, text) pairs) in one transaction."""
+        chat_id = str(chat_id)
+        timestamp = now_iso()
+        with get_db() as conn:
+            conn.execute(
+                'INSERT INTO telegram_sessions (chat_id, candidate_id, stage, history, updated_at) VALUES (?, ?, ?, \'\', ?) '
+                'ON CONFLICT(chat_id) DO UPDATE SET candidate_id = excluded.candidate_id, stage = excluded.stage, updated_at = excluded.updated_at',
+                (chat_id, candidate_id, stage, timestamp)
+            )
+            for speaker, text in messages:
+                conn.execute(
+                    'INSERT INTO telegram_messages (chat_id, seq, speaker, text, created_at) '
+                    'SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM telegram_messages WHERE chat_id = ?',
+                    (chat_id, speaker, text, timestamp, chat_id)
+                )
+        self._update_cached(chat_id, candidate_id=candidate_id, stage=stage)
+
+    def save_summary(self, chat_id, summary, summary_seq):
+        """Store the rolling conversation summary covering turns up to ``summary_seq``."""
+        chat_id = str(chat_id)
+        with get_db() as conn:
+            conn.execute(
+                'UPDATE telegram_sessions SET summary = ?, summary_seq = ? WHERE chat_id = ?',
+                (summary, summary_seq, chat_id)
+            )
+        self._update_cached(chat_id, summary=summary, summary_seq=summary_seq)
+
+    def _update_cached(self, chat_id, **fields):
+        # Only a cached copy can be patched; otherwise the next get() reloads the full row.
+        with self._lock:
+            self._loading.pop(chat_id, None)
+            entry = self._entries.get(chat_id)
+        if entry:
+            self._cache(chat_id, dict(entry[0], **fields))
+
+    def delete(self, chat_id):
+        chat_id = str(chat_id)
+        with get_db() as conn:
+            conn.execute('DELETE FROM telegram_sessions WHERE chat_id = ?', (chat_id,))
+            conn.execute('DELETE FROM telegram_messages WHERE chat_id = ?', (chat_id,))
+        with self._lock:
+            self._loading.pop(chat_id, None)
+            self._entries.pop(chat_id, None)
+
+
+session_store = SessionStore(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
+
+
+@tracer.wrap('session.get')
 def get_session(chat_id):
-    with get_db() as conn:
-        return conn.execute(
-            'SELECT chat_id, candidate_id, stage, history FROM telegram_sessions WHERE chat_id = ?',
-            (str(chat_id),)
-        ).fetchone()
+    return session_store.get(chat_id)
 
 
-def upsert_session(chat_id, candidate_id, stage, history=''):
-    with get_db() as conn:
-        conn.execute(
-            'INSERT INTO telegram_sessions (chat_id, candidate_id, stage, history, updated_at) VALUES (?, ?, ?, ?, ?) '
-            'ON CONFLICT(chat_id) DO UPDATE SET candidate_id = excluded.candidate_id, stage = excluded.stage, history = excluded.history, updated_at = excluded.updated_at',
-            (str(chat_id), candidate_id, stage, history, now_iso())
-        )
+@tracer.wrap('session.save')
+def upsert_session(chat_id, candidate_id, stage, messages=()):
+    session_store.save(chat_id, candidate_id, stage, messages)
 
 
 def append_session_history(chat_id, speaker, text):
     session = get_session(chat_id)
-    history = (session['history'] if session else '') or ''
-    updated = (history + f'\n{speaker}: {text}').strip()
     if session:
-        upsert_session(chat_id, session['candidate_id'], session['stage'], updated)
+        upsert_session(chat_id, session['candidate_id'], session['stage'], [(speaker, text)])
 
 
-def delete_session(chat_id):
-    with get_db() as conn:
-        conn.execute('DELETE FROM telegram_sessions WHERE chat_id = ?', (str(chat_id),))
+def format_history(messages):
+    return '\n'.join(f"{m['speaker']}: {m['text']}" for m in messages)
+
+
+def invoke_chain(chain, prompt_name, inputs):
+    """Invoke a LangChain chain, recording OpenAI latency and tokens under ``prompt_name``."""
+    with tracer.span(f'openai.{prompt_name}') as span:
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            with get_openai_callback() as usage:
+                result = chain.invoke(inputs)
+            outcome = 'ok'
+        finally:
+            OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - started, prompt=prompt_name, outcome=outcome)
+        record_openai_usage(prompt_name, usage)
+        span.set_attribute('prompt_tokens', usage.prompt_tokens)
+        span.set_attribute('completion_tokens', usage.completion_tokens)
+        return result
+
+
+def summarize_conversation(summary, messages):
+    """Fold ``messages`` into the rolling ``summary`` and return the new summary."""
+    transcript = format_history(messages)
+    max_chars = AGENT_SUMMARY_MAX_TOKENS * 4
+    openai_key = os.environ.get('OPENAI_API_KEY')
+    if not openai_key:
+        combined = f'{summary}\n{transcript}'.strip()
+        return combined[-max_chars:]
+
+    prompt = PromptTemplate(
+        input_variables=['summary', 'transcript', 'max_words'],
+        template=(
+            'You maintain a running summary of a Telegram chat between a candidate and '
+            'Mr Traqchecker, who collects PAN and Aadhaar documents.\n'
+            'Keep which documents were shared or are pending, problems the candidate reported, '
+            'and open questions. Drop greetings and small talk.\n'
+            'Reply with the updated summary only, at most {max_words} words.\n'
+            'Current summary:\n{summary}\n'
+            'New messages:\n{transcript}\n'
+            'Updated summary:'
+        ),
+    )
+    llm = ChatOpenAI(temperature=0, openai_api_key=openai_key)
+    chain = prompt | llm
+    result = invoke_chain(
+        chain,
+        'conversation_summary',
+        {
+            'summary': summary or 'No summary yet.',
+            'transcript': transcript,
+            'max_words': max(AGENT_SUMMARY_MAX_TOKENS * 3 // 4, 1),
+        }
+    )
+    text = str(result.content if hasattr(result, 'content') else result).strip()
+    return text[:max_chars]
 
 
-def save_document(candidate_id, doc_type, file_path):
+@tracer.wrap('agent.build_context')
+def build_agent_context(chat_id, session=None):
+    """Return ``(summary, history)`` for the next Mr Traqchecker prompt.
+
+    The newest turns not yet covered by the session summary are kept verbatim
+    until AGENT_CONTEXT_TOKEN_BUDGET or AGENT_HISTORY_TURNS is reached. Older
+    turns stay in the prompt too until they add up to
+    AGENT_SUMMARY_TRIGGER_TOKENS, then they are folded into the rolling summary
+    stored on the session. The prompt therefore stays roughly the same size
+    however long the conversation gets.
+
+    At most ``2 * AGENT_HISTORY_TURNS`` turns are read per call. A longer
+    backlog, left by failed summaries, is folded oldest first, one such batch
+    per call.
+    """
+    chat_id = str(chat_id)
+    session = session or get_session(chat_id) or {}
+    summary = session.get('summary') or ''
+    summary_seq = session.get('summary_seq') or 0
+    window = AGENT_HISTORY_TURNS * 2
     with get_db() as conn:
-        conn.execute(
-            'INSERT INTO documents (id, candidate_id, type, path, status) VALUES (?, ?, ?, ?, ?)',
-            (str(uuid.uuid4()), candidate_id, doc_type, file_path, 'collected')
-        )
+        rows = conn.execute(
+            'SELECT seq, speaker, text FROM telegram_messages WHERE chat_id = ? AND seq > ? ORDER BY seq DESC LIMIT ?',
+            (chat_id, summary_seq, window)
+        ).fetchall()
 
+    recent = []
+    used = 0
+    index = 0
+    for index, row in enumerate(rows):
+        tokens = estimate_tokens(row['text'])
+        if recent and (len(recent) >= AGENT_HISTORY_TURNS or used + tokens > AGENT_CONTEXT_TOKEN_BUDGET):
+            break
+        if not recent and tokens > AGENT_CONTEXT_TOKEN_BUDGET:
+            # A single oversized turn is cut down to the budget, keeping its end.
+            row = {'seq': row['seq'], 'speaker': row['speaker'], 'text': row['text'][-AGENT_CONTEXT_TOKEN_BUDGET * 4:]}
+            tokens = AGENT_CONTEXT_TOKEN_BUDGET
+        recent.append(row)
+        used += tokens
+    else:
+        index = len(rows)
+
+    older = list(reversed(rows[index:]))
+    backlog = len(rows) == window
+    if backlog or sum(estimate_tokens(row['text']) for row in older) >= AGENT_SUMMARY_TRIGGER_TOKENS:
+        to_fold = older
+        if backlog:
+            # More unsummarised turns precede this window; fold from the oldest.
+            with get_db() as conn:
+                to_fold = conn.execute(
+                    'SELECT seq, speaker, text FROM telegram_messages '
+                    'WHERE chat_id = ? AND seq > ? AND seq < ? ORDER BY seq LIMIT ?',
+                    (chat_id, summary_seq, recent[-1]['seq'], window)
+                ).fetchall()
+        try:
+            summary = summarize_conversation(summary, to_fold)
+            session_store.save_summary(chat_id, summary, to_fold[-1]['seq'])
+            older = [row for row in older if row['seq'] > to_fold[-1]['seq']]
+        except Exception as exc:
+            print(f'Conversation summary failed for chat {chat_id}: {exc}')
+
+    # Turns not folded yet stay verbatim, newest first up to the summary trigger.
+    pending = []
+    used = 0
+    for row in reversed(older):
+        used += estimate_tokens(row['text'])
+        if used > AGENT_SUMMARY_TRIGGER_TOKENS:
+            break
+        pending.append(row)
 
-def mr_traqchecker_response(stage, user_text, history):
+    return summary, format_history(list(reversed(pending)) + list(reversed(recent)))
+
+
+def delete_session(chat_id):
+    session_store.delete(chat_id)
+
+
+def guess_mime_type(filename):
+    return mimetypes.guess_type(filename or '')[0] or 'application/octet-stream'
+
+
+def store_blob(src_path, mime_type=None, sha256=None, size=None, keep_source=False):
+    """Move a staged file into the blob store and take a reference to it.
+
+    Identical content is stored once: if the blob exists the staged file is
+    dropped and only the reference count goes up. Returns (sha256, blob_path).
+    """
+    if sha256 is None or size is None:
+        sha256, size = blob_store.hash_file(src_path)
+    with blob_store.lock:
+        path = blob_store.copy_in(src_path, sha256) if keep_source else blob_store.put(src_path, sha256)
+        try:
+            with get_db() as conn:
+                conn.execute(
+                    'INSERT INTO blobs (sha256, size, mime_type, refcount, created_at) VALUES (?, ?, ?, 1, ?) '
+                    'ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1',
+                    (sha256, size, mime_type or 'application/octet-stream', now_iso())
+                )
+        except Exception:
+            with get_db() as conn:
+                referenced = conn.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+            if not referenced:
+                blob_store.remove(sha256)
+            raise
+    return sha256, path
+
+
+def release_blobs(hashes):
+    """Drop one reference per hash; blobs left unreferenced are unlinked."""
+    hashes = [h for h in hashes if h]
+    if not hashes:
+        return
+    with blob_store.lock:
+        with get_db() as conn:
+            conn.executemany('UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?', [(h,) for h in hashes])
+            placeholders = ','.join('?' * len(set(hashes)))
+            orphaned = [
+                row['sha256'] for row in conn.execute(
+                    f'SELECT sha256 FROM blobs WHERE refcount <= 0 AND sha256 IN ({placeholders})', list(set(hashes))
+                ).fetchall()
+            ]
+            conn.execute(f'DELETE FROM blobs WHERE refcount <= 0 AND sha256 IN ({placeholders})', list(set(hashes)))
+        for sha256 in orphaned:
+            try:
+                blob_store.remove(sha256)
+            except OSError as exc:
+                print(f'Warning: failed to delete blob {sha256}: {exc}')
+
+
+@tracer.wrap('db.save_document')
+def save_document(candidate_id, doc_type, src_path, filename=None, sha256=None, size=None):
+    """Store a staged file as a collected document; returns the blob path.
+
+    ``filename`` only picks the MIME type; ``sha256``/``size`` skip re-hashing
+    when the caller already computed them.
+    """
+    sha256, path = store_blob(src_path, guess_mime_type(filename or src_path), sha256, size)
+    try:
+        with get_db() as conn:
+            conn.execute(
+                'INSERT INTO documents (id, candidate_id, type, path, status, sha256) VALUES (?, ?, ?, ?, ?, ?)',
+                (str(uuid.uuid4()), candidate_id, doc_type, path, 'collected', sha256)
+            )
+    except Exception:
+        release_blobs([sha256])
+        raise
+    return path
+
+
+def mr_traqchecker_response(stage, user_text, history, summary=''):
     openai_key = os.environ.get('OPENAI_API_KEY')
     if not openai_key:
         if stage == SESSION_STAGE_PAN:
@@ -359,22 +1257,26 @@ def mr_traqchecker_response(stage, user_text, history):
     }.get(stage, 'You are collecting PAN and Aadhaar documents.')
 
     prompt = PromptTemplate(
-        input_variables=['history', 'user_input', 'stage_instruction'],
+        input_variables=['summary', 'history', 'user_input', 'stage_instruction'],
         template=(
             'You are Mr Traqchecker from Traqcheckjobs.com.\n'
             'Goal: collect PAN and Aadhaar documents over Telegram with polite natural language.\n'
             '{stage_instruction}\n'
             'Stay focused on document collection and do not deviate from this agenda.\n'
             'Keep replies concise (max 3 short sentences).\n'
-            'Conversation history:\n{history}\n'
+            'Summary of earlier conversation:\n{summary}\n'
+            'Recent conversation:\n{history}\n'
             'User message:\n{user_input}\n'
             'Assistant reply:'
         ),
     )
     llm = ChatOpenAI(temperature=0.2, openai_api_key=openai_key)
     chain = prompt | llm
-    result = chain.invoke(
+    result = invoke_chain(
+        chain,
+        'mr_traqchecker',
         {
+            'summary': summary or 'None.',
             'history': history or 'No prior history.',
             'user_input': user_text or '',
             'stage_instruction': stage_instruction,
@@ -385,12 +1287,245 @@ def mr_traqchecker_response(stage, user_text, history):
     return result.strip()
 
 
+STAGE_DOCUMENT_REQUESTS = {
+    SESSION_STAGE_PAN: 'Please share your PAN (photo, PDF, or the 10-character number like ABCPE1234F).',
+    SESSION_STAGE_AADHAAR: 'Please share your Aadhaar (photo, PDF, or the 12-digit number).',
+    SESSION_STAGE_DONE: 'Your PAN and Aadhaar are already collected. Thank you.',
+}
+
+
+def mr_traqchecker_template_reply(stage, kind):
+    """Reply for a recognized message kind, or None when the LLM should answer."""
+    next_step = STAGE_DOCUMENT_REQUESTS.get(stage, STAGE_DOCUMENT_REQUESTS[SESSION_STAGE_PAN])
+    if stage == SESSION_STAGE_DONE and kind in (KIND_PAN, KIND_AADHAAR, KIND_DONE, KIND_THANKS):
+        return next_step
+    if kind == KIND_PAN:
+        return f'I already have your PAN. {next_step}'
+    if kind == KIND_AADHAAR:
+        return f'That looks like an Aadhaar number, but I need your PAN first. {next_step}'
+    if kind == KIND_INVALID_PAN:
+        return 'That does not look like a valid PAN. It should be 5 letters, 4 digits and a letter, like ABCPE1234F. Please check it and send it again.'
+    if kind == KIND_INVALID_AADHAAR:
+        return 'That does not look like a valid Aadhaar number. It should be 12 digits. Please check it and send it again.'
+    if kind == KIND_WHERE_TO_SEND:
+        return f'You can send it right here in this chat. {next_step}'
+    if kind == KIND_DONE:
+        missing = 'PAN' if stage == SESSION_STAGE_PAN else 'Aadhaar'
+        return f'I have not received your {missing} yet. {next_step}'
+    if kind == KIND_GREETING:
+        return f'Hello! {next_step}'
+    if kind == KIND_THANKS:
+        return f'You are welcome. {next_step}'
+    return None
+
+
 def start_document_collection(chat_id, candidate):
-    upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN, '')
+    upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN)
     telegram_send_message(chat_id, mr_traqchecker_intro_message(candidate))
     telegram_send_message(chat_id, 'Please share your PAN document first.')
 
+CANDIDATE_INSERT_SQL = (
+    'INSERT INTO candidates (id, name, email, phone, company, designation, skills, company_history, resume_path, '
+    'phone_normalized, telegram_username_normalized, resume_sha256, resume_text_sha256) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+
+
+def candidate_insert_params(candidate_id, data, file_path, sha256=None):
+    return (candidate_id, data['name'], data['email'], data['phone'], data['company'], data['designation'],
+            json.dumps(data['skills']), json.dumps(data.get('company_history', [])), file_path,
+            normalize_contact(data['phone']), '', sha256, data.get('text_sha256'))
+
+
+CANDIDATE_SKILL_INSERT_SQL = 'INSERT OR IGNORE INTO candidate_skills (skill, candidate_id) VALUES (?, ?)'
+
+
+def save_candidate(candidate_id, data, file_path, sha256=None):
+    with get_db() as conn:
+        conn.execute(CANDIDATE_INSERT_SQL, candidate_insert_params(candidate_id, data, file_path, sha256))
+        conn.executemany(CANDIDATE_SKILL_INSERT_SQL, candidate_skill_rows(candidate_id, data['skills']))
+
+
+def save_candidates(rows):
+    """Insert (candidate_id, data, file_path, sha256) rows in a single transaction."""
+    with get_db() as conn:
+        conn.executemany(CANDIDATE_INSERT_SQL, [candidate_insert_params(*row) for row in rows])
+        conn.executemany(
+            CANDIDATE_SKILL_INSERT_SQL,
+            [skill_row for row in rows for skill_row in candidate_skill_rows(row[0], row[1]['skills'])]
+        )
+
+
+@tracer.wrap('db.save_candidate')
+def save_candidate_with_resume(candidate_id, data, staged_path, filename):
+    """Move a parsed resume into the blob store and insert its candidate row.
+
+    On failure the blob reference is released (or the staged file removed)
+    before the exception propagates.
+    """
+    sha256 = None
+    try:
+        sha256, resume_path = store_blob(staged_path, guess_mime_type(filename))
+        save_candidate(candidate_id, data, resume_path, sha256)
+    except Exception:
+        if sha256:
+            release_blobs([sha256])
+        elif os.path.exists(staged_path):
+            os.remove(staged_path)
+        raise
+
+
+ingestion_executor = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix='resume-ingest')
+ingestion_pending = threading.BoundedSemaphore(INGESTION_MAX_PENDING)
+
+# In-flight ingestion jobs and Telegram updates carry a lease owned by the
+# claiming process. The owner renews it while it is alive, so replay only
+# reclaims work whose process has gone away.
+LEASE_CLAIMABLE_SQL = (
+    "(status = ? OR (status = ? AND COALESCE(lease_expires_at, 0) < CAST(strftime('%s', 'now') AS INTEGER)))"
+)
+LEASE_EXPIRY_SQL = "CAST(strftime('%s', 'now') AS INTEGER) + ?"
+worker_ids = {}
+lease_renewal_lock = threading.Lock()
+lease_renewal_started = False
+
+
+def worker_id():
+    # Keyed by pid so forked WSGI workers do not share the parent's identity.
+    pid = os.getpid()
+    if pid not in worker_ids:
+        worker_ids[pid] = f'{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}'
+    return worker_ids[pid]
+
+
+def renew_leases():
+    with get_db() as conn:
+        for table, status in (('ingestion_jobs', JOB_STATUS_EXTRACTING), ('telegram_updates', UPDATE_STATUS_PROCESSING)):
+            conn.execute(
+                f'UPDATE {table} SET lease_expires_at = {LEASE_EXPIRY_SQL} WHERE lease_owner = ? AND status = ?',
+                (WORK_LEASE_SECONDS, worker_id(), status)
+            )
+
+
+def lease_renewal_loop():
+    while True:
+        time.sleep(max(WORK_LEASE_SECONDS / 3, 1))
+        try:
+            renew_leases()
+        except Exception as exc:
+            print(f'Lease renewal failed: {exc}')
+
+
+def start_lease_renewal():
+    global lease_renewal_started
+    with lease_renewal_lock:
+        if lease_renewal_started:
+            return
+        threading.Thread(target=lease_renewal_loop, name='lease-renewal', daemon=True).start()
+        lease_renewal_started = True
+
+
+def create_ingestion_job(file_path, filename):
+    job_id = str(uuid.uuid4())
+    timestamp = now_iso()
+    with get_db() as conn:
+        conn.execute(
+            'INSERT INTO ingestion_jobs (id, status, stage, error, file_path, filename, candidate_id, created_at, updated_at) '
+            'VALUES (?, ?, NULL, NULL, ?, ?, NULL, ?, ?)',
+            (job_id, JOB_STATUS_QUEUED, file_path, filename, timestamp, timestamp)
+        )
+    return job_id
+
+
+def get_ingestion_job(job_id):
+    with get_db() as conn:
+        return conn.execute(
+            'SELECT id, status, stage, error, file_path, filename, candidate_id, created_at, updated_at '
+            'FROM ingestion_jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+
+
+def update_ingestion_job(job_id, status, stage=None, error=None, candidate_id=None):
+    if status == JOB_STATUS_FAILED:
+        EXTRACTION_FAILURES.inc(stage=stage or 'unknown')
+    with get_db() as conn:
+        conn.execute(
+            'UPDATE ingestion_jobs SET status = ?, stage = ?, error = ?, candidate_id = ?, updated_at = ? WHERE id = ?',
+            (status, stage, error, candidate_id, now_iso(), job_id)
+        )
+
+
+def claim_ingestion_job(job_id):
+    # Only one worker may move a job out of the queue, even if it was submitted twice.
+    # A job left extracting by a process that stopped renewing its lease may be taken over.
+    start_lease_renewal()
+    with get_db() as conn:
+        cursor = conn.execute(
+            f'UPDATE ingestion_jobs SET status = ?, lease_owner = ?, lease_expires_at = {LEASE_EXPIRY_SQL}, '
+            f'updated_at = ? WHERE id = ? AND {LEASE_CLAIMABLE_SQL}',
+            (JOB_STATUS_EXTRACTING, worker_id(), WORK_LEASE_SECONDS, now_iso(), job_id,
+             JOB_STATUS_QUEUED, JOB_STATUS_EXTRACTING)
+        )
+        return cursor.rowcount == 1
+
+
+def run_ingestion_job(job_id):
+    try:
+        if not claim_ingestion_job(job_id):
+            return
+        job = get_ingestion_job(job_id)
+        file_path = job['file_path']
+
+        try:
+            data = extract_resume_data(file_path, job['filename'])
+        except Exception as exc:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            update_ingestion_job(job_id, JOB_STATUS_FAILED, 'extraction', f'Error parsing the resume because {exc}')
+            return
+
+        candidate_id = str(uuid.uuid4())
+        try:
+            save_candidate_with_resume(candidate_id, data, file_path, job['filename'])
+        except Exception as exc:
+            update_ingestion_job(job_id, JOB_STATUS_FAILED, 'db_save', f'Error parsing the resume because DB save failed: {exc}')
+            return
+
+        update_ingestion_job(job_id, JOB_STATUS_SAVED, candidate_id=candidate_id)
+    except Exception as exc:
+        print(f'Ingestion job {job_id} error: {exc}')
+    finally:
+        ingestion_pending.release()
+
+
+def submit_ingestion_job(job_id):
+    if not ingestion_pending.acquire(blocking=False):
+        return False
+    ingestion_executor.submit(bind_context(run_ingestion_job), job_id)
+    return True
+
+
+def resume_pending_ingestion_jobs():
+    """Submit queued jobs and jobs whose extracting lease has expired.
+
+    Jobs still queued in another live process are claimed by whichever
+    worker gets to them first; the other one skips them.
+    """
+    with get_db() as conn:
+        job_ids = [
+            row['id'] for row in conn.execute(
+                f'SELECT id FROM ingestion_jobs WHERE {LEASE_CLAIMABLE_SQL} ORDER BY created_at',
+                (JOB_STATUS_QUEUED, JOB_STATUS_EXTRACTING)
+            ).fetchall()
+        ]
+    for job_id in job_ids:
+        if not submit_ingestion_job(job_id):
+            break
+
+
 @app.route('/candidates/upload', methods=['POST'])
+@tracer.wrap('upload_resume')
 def upload_resume():
     if 'resume' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -398,14 +1533,40 @@ def upload_resume():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     if file and allowed_file(file.filename):
+        mode = (request.args.get('mode') or RESUME_INGESTION_MODE).lower()
         filename = secure_filename(file.filename)
         unique_filename = f"{uuid.uuid4()}_{filename}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         file.save(file_path)
 
+        if mode == 'async':
+            job_id = create_ingestion_job(file_path, filename)
+            if not submit_ingestion_job(job_id):
+                update_ingestion_job(job_id, JOB_STATUS_FAILED, 'queue', 'Ingestion queue is full')
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return jsonify({
+                    'error': 'Ingestion queue is full, please retry shortly',
+                    'job_id': job_id,
+                    'stage': 'queue'
+                }), 503
+            response = jsonify({
+                'job_id': job_id,
+                'status': JOB_STATUS_QUEUED,
+                'status_url': f'/jobs/{job_id}',
+                'extraction_mode': RESUME_EXTRACTION_MODE,
+                'messages': [
+                    'Resume uploaded successfully',
+                    'Extraction queued'
+                ]
+            })
+            response.headers['Location'] = f'/jobs/{job_id}'
+            return response, 202
+
         try:
             data = extract_resume_data(file_path, filename)
         except ResumeExtractionError as exc:
+            EXTRACTION_FAILURES.inc(stage='extraction')
             if os.path.exists(file_path):
                 os.remove(file_path)
             return jsonify({
@@ -413,6 +1574,7 @@ def upload_resume():
                 'stage': 'extraction'
             }), 422
         except Exception as exc:
+            EXTRACTION_FAILURES.inc(stage='extraction')
             if os.path.exists(file_path):
                 os.remove(file_path)
             return jsonify({
@@ -423,12 +1585,9 @@ def upload_resume():
         candidate_id = str(uuid.uuid4())
 
         try:
-            with get_db() as conn:
-                conn.execute('INSERT INTO candidates (id, name, email, phone, company, designation, skills, company_history, resume_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                             (candidate_id, data['name'], data['email'], data['phone'], data['company'], data['designation'], json.dumps(data['skills']), json.dumps(data.get('company_history', [])), file_path))
+            save_candidate_with_resume(candidate_id, data, file_path, filename)
         except Exception as exc:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            EXTRACTION_FAILURES.inc(stage='db_save')
             return jsonify({
                 'error': f'Error parsing the resume because DB save failed: {exc}',
                 'stage': 'db_save'
@@ -437,6 +1596,7 @@ def upload_resume():
         return jsonify({
             'id': candidate_id,
             'confidence': data['confidence'],
+            'extraction_mode': data.get('extraction_mode'),
             'messages': [
                 'Resume uploaded successfully',
                 'Extraction successful',
@@ -445,34 +1605,438 @@ def upload_resume():
         }), 201
     return jsonify({'error': 'Invalid file type'}), 400
 
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_ingestion_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'error': job['error'],
+        'candidate_id': job['candidate_id'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    })
+
+
+def copy_stream_limited(src, dst, limit):
+    copied = 0
+    while True:
+        chunk = src.read(64 * 1024)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > limit:
+            raise ValueError('File is too large')
+        dst.write(chunk)
+
+
+def mark_bulk_failed(entry, stage, error):
+    entry.pop('text', None)
+    entry.pop('data', None)
+    entry.update({'status': 'failed', 'stage': stage, 'error': error})
+    EXTRACTION_FAILURES.inc(stage=stage)
+    file_path = entry.pop('file_path', None)
+    sha256 = entry.pop('sha256', None)
+    if sha256:
+        release_blobs([sha256])
+    elif file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def stage_bulk_file(entries, filename, stream):
+    entry = {'filename': filename}
+    entries.append(entry)
+    if len([e for e in entries if 'file_path' in e]) >= BULK_MAX_FILES:
+        mark_bulk_failed(entry, 'upload', f'Bulk import is limited to {BULK_MAX_FILES} files')
+        return
+    if not allowed_file(filename):
+        mark_bulk_failed(entry, 'upload', 'Invalid file type')
+        return
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4()}_{secure_filename(filename)}')
+    entry['file_path'] = file_path
+    try:
+        with open(file_path, 'wb') as dst:
+            copy_stream_limited(stream, dst, BULK_MAX_FILE_BYTES)
+    except Exception as exc:
+        mark_bulk_failed(entry, 'upload', str(exc))
+
+
+@app.route('/candidates/bulk-upload', methods=['POST'])
+@tracer.wrap('bulk_upload_resumes')
+def bulk_upload_resumes():
+    entries = []
+    for file in request.files.getlist('resumes'):
+        if file and file.filename:
+            stage_bulk_file(entries, file.filename, file.stream)
+
+    archive = request.files.get('archive')
+    if archive and archive.filename:
+        try:
+            with zipfile.ZipFile(archive.stream) as zf:
+                for info in zf.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                        continue
+                    with zf.open(info) as member:
+                        stage_bulk_file(entries, name, member)
+        except zipfile.BadZipFile:
+            for entry in entries:
+                mark_bulk_failed(entry, 'upload', 'Bulk import aborted: archive is not a valid zip file')
+            return jsonify({'error': 'Invalid zip archive'}), 400
+
+    if not entries:
+        return jsonify({'error': 'No files provided. Send "resumes" files or an "archive" zip.'}), 400
+
+    # Text extraction is CPU-bound PDF/DOCX parsing; each file is read on the
+    # shared text process pool, which enforces RESUME_TEXT_TIMEOUT per file.
+    # Files are not split across workers so the whole import shares the pool.
+    staged = [e for e in entries if 'file_path' in e]
+    # Backstop only: every read is already bounded, so this allows for the
+    # files queued ahead of each one.
+    text_deadline = time.monotonic() + TEXT_TIMEOUT * (-(-len(staged) // TEXT_WORKERS) + 1)
+    text_pool = ThreadPoolExecutor(max_workers=TEXT_WORKERS, thread_name_prefix='bulk-text')
+    text_futures = [(text_pool.submit(extract_text_from_file, e['file_path'], False), e) for e in staged]
+    for future, entry in text_futures:
+        try:
+            entry['text'] = future.result(timeout=max(text_deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            mark_bulk_failed(entry, 'extraction', 'Error parsing the resume because text extraction timed out')
+        except Exception as exc:
+            mark_bulk_failed(entry, 'extraction', f'Error parsing the resume because {exc}')
+    text_pool.shutdown(wait=False, cancel_futures=True)
+
+    concurrency = request.args.get('concurrency', BULK_LLM_CONCURRENCY, type=int)
+    concurrency = max(1, min(concurrency, BULK_LLM_CONCURRENCY))
+    extracted = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk-extract') as pool:
+        llm_futures = [
+            (pool.submit(bind_context(extract_resume_info_from_text), e.pop('text')), e)
+            for e in staged if 'text' in e
+        ]
+        for future, entry in llm_futures:
+            try:
+                data = future.result()
+            except Exception as exc:
+                mark_bulk_failed(entry, 'extraction', f'Error parsing the resume because {exc}')
+                continue
+            data['confidence'] = 0.95
+            entry['data'] = data
+            extracted.append(entry)
+
+    stored = []
+    for entry in extracted:
+        try:
+            entry['sha256'], entry['file_path'] = store_blob(entry['file_path'], guess_mime_type(entry['filename']))
+            stored.append(entry)
+        except Exception as exc:
+            mark_bulk_failed(entry, 'db_save', f'Error storing the resume file: {exc}')
+
+    for start in range(0, len(stored), BULK_INSERT_BATCH_SIZE):
+        batch = stored[start:start + BULK_INSERT_BATCH_SIZE]
+        rows = [(str(uuid.uuid4()), e['data'], e['file_path'], e['sha256']) for e in batch]
+        try:
+            save_candidates(rows)
+            saved = list(zip(rows, batch))
+        except Exception:
+            # Retry row by row so a single bad record does not fail its whole batch.
+            saved = []
+            for row, entry in zip(rows, batch):
+                try:
+                    save_candidate(*row)
+                    saved.append((row, entry))
+                except Exception as exc:
+                    mark_bulk_failed(entry, 'db_save', f'Error parsing the resume because DB save failed: {exc}')
+        for row, entry in saved:
+            data = entry.pop('data')
+            entry.pop('file_path')
+            entry.pop('sha256')
+            entry.update({
+                'status': 'saved',
+                'id': row[0],
+                'confidence': data['confidence'],
+                'extraction_mode': data.get('extraction_mode')
+            })
+
+    saved_count = len([e for e in entries if e.get('status') == 'saved'])
+    return jsonify({
+        'total': len(entries),
+        'saved': saved_count,
+        'failed': len(entries) - saved_count,
+        'results': entries
+    }), 200
+
+CANDIDATE_LIST_FIELDS = (
+    'id', 'name', 'email', 'phone', 'company', 'designation', 'skills',
+    'company_history', 'extraction_status', 'confidence', 'telegram_username'
+)
+CANDIDATE_LIST_COLUMNS = {'id', 'name', 'email', 'phone', 'company', 'designation', 'skills', 'company_history', 'telegram_username'}
+CANDIDATE_SORT_KEYS = {
+    'created': None,
+    'name': "COALESCE(name, '')",
+    'email': "COALESCE(email, '')",
+    'company': "COALESCE(company, '')",
+    'designation': "COALESCE(designation, '')",
+}
+CANDIDATE_LIST_MAX_LIMIT = 500
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+
+
+def get_table_version(name):
+    with get_db() as conn:
+        return conn.execute('SELECT version, updated_at FROM table_versions WHERE name = ?', (name,)).fetchone()
+
+
+def load_json_list(value):
+    try:
+        return json.loads(value) if value else []
+    except json.JSONDecodeError:
+        return []
+
+
+def serialize_candidate_row(c, fields):
+    item = {}
+    for field in fields:
+        if field in ('skills', 'company_history'):
+            item[field] = load_json_list(c[field])
+        elif field == 'extraction_status':
+            item[field] = 'Extracted'
+        elif field == 'confidence':
+            item[field] = 0.95
+        else:
+            item[field] = c[field]
+    return item
+
+
 @app.route('/candidates', methods=['GET'])
 def list_candidates():
+    requested_fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    unknown_fields = [f for f in requested_fields if f not in CANDIDATE_LIST_FIELDS]
+    if unknown_fields:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+    fields = [f for f in CANDIDATE_LIST_FIELDS if f == 'id' or f in requested_fields] if requested_fields else list(CANDIDATE_LIST_FIELDS)
+
+    sort = request.args.get('sort', 'created')
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in CANDIDATE_SORT_KEYS:
+        return jsonify({'error': f"Invalid sort. Use one of: {', '.join(CANDIDATE_SORT_KEYS)}"}), 400
+
+    if request.args.get('match', 'all') not in ('all', 'any'):
+        return jsonify({'error': 'match must be "all" or "any"'}), 400
+
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= CANDIDATE_LIST_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {CANDIDATE_LIST_MAX_LIMIT}'}), 400
+
+    # The version row changes on every candidates write, so an unchanged list can be
+    # answered from it alone without reading any candidate rows.
+    version = get_table_version('candidates')
+    etag = hashlib.sha1(f"{version['version']}|{request.query_string.decode('utf-8')}".encode('utf-8')).hexdigest()
+    last_modified = datetime.fromtimestamp(version['updated_at'], tz=timezone.utc)
+    # updated_at has one-second resolution: a change in the current second may be
+    # followed by another in the same second, so Last-Modified is only sent and
+    # honoured once that second is over. The ETag always covers it.
+    last_modified_final = version['updated_at'] < int(time.time())
+    not_modified = (
+        request.if_none_match.contains_weak(etag) if request.if_none_match
+        else bool(last_modified_final and request.if_modified_since and last_modified <= request.if_modified_since)
+    )
+    if not_modified:
+        response = app.response_class(status=304)
+    else:
+        columns = [f for f in fields if f in CANDIDATE_LIST_COLUMNS]
+        sort_expr = CANDIDATE_SORT_KEYS[sort_key]
+        select = ['rowid AS row_id'] + columns + ([f'{sort_expr} AS sort_value'] if sort_expr else [])
+        where = []
+        params = []
+
+        search = request.args.get('q', '').strip()
+        if search:
+            where.append('(name LIKE ? OR email LIKE ?)')
+            params.extend([f'%{search}%', f'%{search}%'])
+        for column in ('company', 'designation'):
+            value = request.args.get(column, '').strip()
+            if value:
+                where.append(f'{column} = ? COLLATE NOCASE')
+                params.append(value)
+
+        skills = [canonical_skill(v) for v in request.args.get('skills', '').split(',')]
+        skills = list(dict.fromkeys(skill for skill in skills if skill))
+        if skills:
+            # Served from the candidate_skills (skill, candidate_id) primary key: INTERSECT for
+            # match=all, UNION for match=any.
+            combine = ' UNION ' if request.args.get('match', 'all') == 'any' else ' INTERSECT '
+            where.append('id IN (' + combine.join('SELECT candidate_id FROM candidate_skills WHERE skill = ?' for _ in skills) + ')')
+            params.extend(skills)
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                position = None
+            if not isinstance(position, dict):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            operator = '<' if descending else '>'
+            if sort_expr:
+                # The plain bound lets SQLite seek the sort index; the row value breaks ties.
+                where.append(f'{sort_expr} {operator}= ? AND ({sort_expr}, rowid) {operator} (?, ?)')
+                params.extend([position.get('k', ''), position.get('k', ''), position.get('r', 0)])
+            else:
+                where.append(f'rowid {operator} ?')
+                params.append(position.get('r', 0))
+
+        direction = 'DESC' if descending else 'ASC'
+        order = f'{sort_expr} {direction}, rowid {direction}' if sort_expr else f'rowid {direction}'
+        query = f"SELECT {', '.join(select)} FROM candidates"
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += f' ORDER BY {order}'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit + 1)
+
+        with get_db() as conn:
+            candidates = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(candidates) > limit:
+            candidates = candidates[:limit]
+            last = candidates[-1]
+            position = {'r': last['row_id']}
+            if sort_expr:
+                position['k'] = last['sort_value']
+            next_cursor = encode_cursor(position)
+
+        response = jsonify([serialize_candidate_row(c, fields) for c in candidates])
+        if next_cursor:
+            next_args = request.args.to_dict()
+            next_args['cursor'] = next_cursor
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.path}?{urllib_parse.urlencode(next_args)}>; rel="next"'
+
+    response.set_etag(etag, weak=True)
+    if last_modified_final:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+CHANGES_MAX_LIMIT = 1000
+
+
+def fetch_rows_by_ids(conn, query, ids):
+    rows = []
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        placeholders = ', '.join('?' for _ in chunk)
+        rows.extend(conn.execute(query.format(placeholders=placeholders), chunk).fetchall())
+    return rows
+
+
+def collect_changes(since, limit=CHANGES_MAX_LIMIT):
+    """Collapse change_log entries after ``since`` into candidate/document deltas."""
     with get_db() as conn:
-        candidates = conn.execute('SELECT id, name, email, phone, company, designation, skills, company_history, telegram_username FROM candidates').fetchall()
-    result = []
-    for c in candidates:
-        try:
-            skills = json.loads(c['skills']) if c['skills'] else []
-        except json.JSONDecodeError:
-            skills = []
-        try:
-            company_history = json.loads(c['company_history']) if c['company_history'] else []
-        except json.JSONDecodeError:
-            company_history = []
-        result.append({
-            'id': c['id'],
-            'name': c['name'],
-            'email': c['email'],
-            'phone': c['phone'],
-            'company': c['company'],
-            'designation': c['designation'],
-            'skills': skills,
-            'company_history': company_history,
-            'extraction_status': 'Extracted',
-            'confidence': 0.95,
-            'telegram_username': c['telegram_username']
-        })
-    return jsonify(result)
+        bounds = conn.execute('SELECT MIN(seq) AS first_seq, MAX(seq) AS last_seq FROM change_log').fetchone()
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        last_seq = sequence['seq'] if sequence else 0
+        first_seq = bounds['first_seq'] if bounds['first_seq'] is not None else last_seq + 1
+        if since is None or since < first_seq - 1 or since > last_seq:
+            # Unknown or pruned cursor: the client has to reload the full list.
+            return {'cursor': str(last_seq), 'reset': since is not None, 'has_more': False,
+                    'candidates': [], 'deleted': [], 'documents': []}
+
+        entries = conn.execute(
+            'SELECT seq, entity, entity_id, candidate_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?',
+            (since, limit + 1)
+        ).fetchall()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        candidate_ops = {}
+        document_ids = []
+        for entry in entries:
+            if entry['entity'] == 'candidate':
+                candidate_ops[entry['entity_id']] = entry['op']
+            elif entry['op'] == 'insert':
+                document_ids.append(entry['entity_id'])
+
+        upserted_ids = [cid for cid, op in candidate_ops.items() if op != 'delete']
+        candidates = fetch_rows_by_ids(conn, 'SELECT * FROM candidates WHERE id IN ({placeholders})', upserted_ids)
+        documents = fetch_rows_by_ids(
+            conn, 'SELECT id, candidate_id, type, path, status FROM documents WHERE id IN ({placeholders})', document_ids
+        )
+
+    found_ids = {c['id'] for c in candidates}
+    return {
+        'cursor': str(entries[-1]['seq'] if entries else since),
+        'reset': False,
+        'has_more': has_more,
+        'candidates': [serialize_candidate_row(c, CANDIDATE_LIST_FIELDS) for c in candidates],
+        'deleted': [cid for cid, op in candidate_ops.items() if op == 'delete' or cid not in found_ids],
+        'documents': [{
+            'id': d['id'],
+            'candidate_id': d['candidate_id'],
+            'type': d['type'],
+            'path': d['path'],
+            'status': d['status'],
+            'file_url': f"/documents/{d['id']}/file"
+        } for d in documents]
+    }
+
+
+def parse_change_cursor(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return -1
+
+
+@app.route('/candidates/changes', methods=['GET'])
+def candidate_changes():
+    limit = request.args.get('limit', CHANGES_MAX_LIMIT, type=int)
+    limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+    return jsonify(collect_changes(parse_change_cursor(request.args.get('since')), limit))
+
+
+@app.route('/candidates/changes/stream', methods=['GET'])
+def candidate_changes_stream():
+    since = parse_change_cursor(request.headers.get('Last-Event-ID') or request.args.get('since'))
+
+    def generate(cursor):
+        deadline = time.monotonic() + CHANGE_STREAM_MAX_SECONDS
+        payload = collect_changes(cursor)
+        while True:
+            if payload['reset'] or payload['candidates'] or payload['deleted'] or payload['documents'] or cursor is None:
+                yield f"id: {payload['cursor']}\nevent: changes\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield ': keep-alive\n\n'
+            cursor = int(payload['cursor'])
+            if time.monotonic() >= deadline:
+                # Bounded stream so a worker is not held forever; EventSource reconnects with Last-Event-ID.
+                return
+            if not payload['has_more']:
+                time.sleep(CHANGE_STREAM_POLL_SECONDS)
+            payload = collect_changes(cursor)
+
+    response = Response(stream_with_context(generate(since)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/candidates/<id>', methods=['GET'])
 def get_candidate(id):
@@ -567,17 +2131,30 @@ def submit_documents(id):
         pan_filename = secure_filename(pan_file.filename)
         aadhaar_filename = secure_filename(aadhaar_file.filename)
         
-        pan_path = os.path.join(app.config['UPLOAD_FOLDER'], pan_filename)
-        aadhaar_path = os.path.join(app.config['UPLOAD_FOLDER'], aadhaar_filename)
+        pan_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4()}_{pan_filename}')
+        aadhaar_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4()}_{aadhaar_filename}')
         
         pan_file.save(pan_path)
         aadhaar_file.save(aadhaar_path)
         
-        with get_db() as conn:
-            conn.execute('INSERT INTO documents (id, candidate_id, type, path) VALUES (?, ?, ?, ?)',
-                         (str(uuid.uuid4()), id, 'PAN', pan_path))
-            conn.execute('INSERT INTO documents (id, candidate_id, type, path) VALUES (?, ?, ?, ?)',
-                         (str(uuid.uuid4()), id, 'Aadhaar', aadhaar_path))
+        staged = [pan_path, aadhaar_path]
+        stored = []
+        try:
+            pan_sha, pan_path = store_blob(pan_path, guess_mime_type(pan_filename))
+            stored.append(pan_sha)
+            aadhaar_sha, aadhaar_path = store_blob(aadhaar_path, guess_mime_type(aadhaar_filename))
+            stored.append(aadhaar_sha)
+            with get_db() as conn:
+                conn.execute('INSERT INTO documents (id, candidate_id, type, path, sha256) VALUES (?, ?, ?, ?, ?)',
+                             (str(uuid.uuid4()), id, 'PAN', pan_path, pan_sha))
+                conn.execute('INSERT INTO documents (id, candidate_id, type, path, sha256) VALUES (?, ?, ?, ?, ?)',
+                             (str(uuid.uuid4()), id, 'Aadhaar', aadhaar_path, aadhaar_sha))
+        except Exception:
+            release_blobs(stored)
+            for path in staged:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
         
         return jsonify({'message': 'Documents submitted successfully'}), 200
     return jsonify({'message': 'Documents submitted successfully'}), 200
@@ -591,7 +2168,10 @@ def update_telegram(id):
         return jsonify({'error': 'telegram_username required'}), 400
     
     with get_db() as conn:
-        conn.execute('UPDATE candidates SET telegram_username = ? WHERE id = ?', (telegram_username, id))
+        conn.execute(
+            'UPDATE candidates SET telegram_username = ?, telegram_username_normalized = ? WHERE id = ?',
+            (telegram_username, normalize_contact(telegram_username), id)
+        )
     
     return jsonify({'message': 'Telegram username updated'}), 200
 
@@ -605,23 +2185,17 @@ def extract_start_identity(text):
 
 
 def save_telegram_text_as_document(candidate_id, doc_type, text, chat_id):
-    filename = f'{candidate_id}_{doc_type.lower()}_{chat_id}_{int(datetime.now().timestamp())}.txt'
-    path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
-    with open(path, 'w', encoding='utf-8') as f:
+    fd, tmp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], prefix='.telegram-', suffix='.txt')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
         f.write(text or '')
-    save_document(candidate_id, doc_type, path)
-    return path
+    return save_document(candidate_id, doc_type, tmp_path, 'document.txt')
 
 
 def save_telegram_file_as_document(candidate_id, doc_type, file_id, suggested_ext, chat_id):
-    tg_path, content = telegram_get_file(file_id)
+    tg_path = telegram_get_file_path(file_id)
     ext = suggested_ext or os.path.splitext(tg_path)[1] or '.bin'
-    filename = f'{candidate_id}_{doc_type.lower()}_{chat_id}_{int(datetime.now().timestamp())}{ext}'
-    path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
-    with open(path, 'wb') as f:
-        f.write(content)
-    save_document(candidate_id, doc_type, path)
-    return path
+    tmp_path, size, digest = telegram_download_file(tg_path)
+    return save_document(candidate_id, doc_type, tmp_path, f'document{ext}', digest, size)
 
 
 def process_telegram_update(update):
@@ -653,13 +2227,12 @@ def process_telegram_update(update):
             return
         upsert_telegram_link(linked_candidate['id'], chat_id, username or start_identity)
         candidate = linked_candidate
-        session = get_session(chat_id)
         telegram_send_message(
             chat_id,
             mr_traqchecker_ready_message(candidate)
         )
         if not session:
-            upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN, '')
+            upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN)
             telegram_send_message(chat_id, 'Please share your PAN document first.')
         return
 
@@ -677,64 +2250,197 @@ def process_telegram_update(update):
         return
 
     if not session:
-        upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN, '')
-        session = get_session(chat_id)
+        session = {'chat_id': chat_id, 'candidate_id': candidate['id'], 'stage': SESSION_STAGE_PAN}
+        upsert_session(chat_id, candidate['id'], SESSION_STAGE_PAN)
 
     stage = session['stage']
-    history = session['history'] or ''
 
+    # Each branch below writes the session at most once: new conversation turns and
+    # any stage transition go out in a single transaction.
     try:
-        if message.get('photo'):
-            photo = message['photo'][-1]
+        if message.get('photo') or message.get('document'):
             doc_type = 'PAN' if stage == SESSION_STAGE_PAN else 'Aadhaar'
-            save_telegram_file_as_document(candidate['id'], doc_type, photo['file_id'], '.jpg', chat_id)
-            append_session_history(chat_id, 'User', f'Uploaded {doc_type} photo')
-            if stage == SESSION_STAGE_PAN:
-                upsert_session(chat_id, candidate['id'], SESSION_STAGE_AADHAAR, (get_session(chat_id)['history'] or ''))
-                telegram_send_message(chat_id, 'PAN received. Please share your Aadhaar document now.')
+            if message.get('photo'):
+                photo = message['photo'][-1]
+                save_telegram_file_as_document(candidate['id'], doc_type, photo['file_id'], '.jpg', chat_id)
+                turns = [('User', f'Uploaded {doc_type} photo')]
             else:
-                upsert_session(chat_id, candidate['id'], SESSION_STAGE_DONE, (get_session(chat_id)['history'] or ''))
-                telegram_send_message(chat_id, 'Aadhaar received. Verification documents are collected. Thank you.')
-            return
-
-        if message.get('document'):
-            document = message['document']
-            file_name = document.get('file_name') or ''
-            ext = os.path.splitext(file_name)[1] or '.bin'
-            doc_type = 'PAN' if stage == SESSION_STAGE_PAN else 'Aadhaar'
-            save_telegram_file_as_document(candidate['id'], doc_type, document['file_id'], ext, chat_id)
-            append_session_history(chat_id, 'User', f'Uploaded {doc_type} file')
+                document = message['document']
+                file_name = document.get('file_name') or ''
+                ext = os.path.splitext(file_name)[1] or '.bin'
+                save_telegram_file_as_document(candidate['id'], doc_type, document['file_id'], ext, chat_id)
+                turns = [('User', f'Uploaded {doc_type} file')]
             if stage == SESSION_STAGE_PAN:
-                upsert_session(chat_id, candidate['id'], SESSION_STAGE_AADHAAR, (get_session(chat_id)['history'] or ''))
+                upsert_session(chat_id, candidate['id'], SESSION_STAGE_AADHAAR, turns)
                 telegram_send_message(chat_id, 'PAN received. Please share your Aadhaar document now.')
             else:
-                upsert_session(chat_id, candidate['id'], SESSION_STAGE_DONE, (get_session(chat_id)['history'] or ''))
+                upsert_session(chat_id, candidate['id'], SESSION_STAGE_DONE, turns)
                 telegram_send_message(chat_id, 'Aadhaar received. Verification documents are collected. Thank you.')
             return
 
         if text:
-            append_session_history(chat_id, 'User', text)
-            if stage in (SESSION_STAGE_PAN, SESSION_STAGE_AADHAAR) and len(re.sub(r'[^0-9A-Za-z]', '', text)) >= 6:
+            turns = [('User', text)]
+            kind, _ = recognize_message(text)
+            expected_kind = {SESSION_STAGE_PAN: KIND_PAN, SESSION_STAGE_AADHAAR: KIND_AADHAAR}.get(stage)
+            if kind == expected_kind:
                 doc_type = 'PAN' if stage == SESSION_STAGE_PAN else 'Aadhaar'
                 save_telegram_text_as_document(candidate['id'], doc_type, text, chat_id)
                 if stage == SESSION_STAGE_PAN:
-                    upsert_session(chat_id, candidate['id'], SESSION_STAGE_AADHAAR, (get_session(chat_id)['history'] or ''))
+                    upsert_session(chat_id, candidate['id'], SESSION_STAGE_AADHAAR, turns)
                     telegram_send_message(chat_id, 'Text details received for PAN. Please share Aadhaar details or document now.')
                 else:
-                    upsert_session(chat_id, candidate['id'], SESSION_STAGE_DONE, (get_session(chat_id)['history'] or ''))
+                    upsert_session(chat_id, candidate['id'], SESSION_STAGE_DONE, turns)
                     telegram_send_message(chat_id, 'Text details received for Aadhaar. Verification documents are collected. Thank you.')
                 return
 
-            reply = mr_traqchecker_response(stage, text, history)
-            append_session_history(chat_id, 'Mr Traqchecker', reply)
+            # Recognized numbers and common intents are answered from templates;
+            # only free-form text costs an LLM round trip.
+            reply = mr_traqchecker_template_reply(stage, kind)
+            if reply is None:
+                try:
+                    summary, history = build_agent_context(chat_id, session)
+                    reply = mr_traqchecker_response(stage, text, history, summary)
+                except Exception:
+                    upsert_session(chat_id, candidate['id'], stage, turns)
+                    raise
+            upsert_session(chat_id, candidate['id'], stage, turns + [('Mr Traqchecker', reply)])
             telegram_send_message(chat_id, reply)
             return
 
-        reply = mr_traqchecker_response(stage, '', history)
+        summary, history = build_agent_context(chat_id, session)
+        reply = mr_traqchecker_response(stage, '', history, summary)
         telegram_send_message(chat_id, reply)
+    except TelegramFileTooLarge:
+        limit_mb = TELEGRAM_MAX_FILE_BYTES // (1024 * 1024)
+        telegram_send_message(chat_id, f'That file is too large. Please send a file under {limit_mb} MB.')
     except Exception as exc:
         print(f'Telegram processing error: {exc}')
         telegram_send_message(chat_id, 'Sorry, I hit an issue. Please retry sending your PAN/Aadhaar document.')
+        # Reported to the chat already; handle_telegram_update still counts it as an error.
+        return False
+
+
+def handle_telegram_update(update):
+    """Process one update in its own trace and count it in telegram_updates_processed_total."""
+    outcome = 'error'
+    try:
+        with tracer.span('telegram.update', update_id=update.get('update_id'),
+                         chat_id=telegram_update_chat_id(update)) as span:
+            if process_telegram_update(update) is not False:
+                outcome = 'ok'
+            span.set_attribute('outcome', outcome)
+    finally:
+        TELEGRAM_UPDATES_PROCESSED.inc(outcome=outcome)
+
+
+def telegram_update_chat_id(update):
+    message = update.get('message') or update.get('edited_message') or {}
+    chat_id = (message.get('chat') or {}).get('id')
+    return str(chat_id) if chat_id is not None else ''
+
+
+def record_telegram_update(update_id, chat_id, update):
+    """Persist an incoming update; returns False when update_id was already received."""
+    with get_db() as conn:
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO telegram_updates (update_id, chat_id, payload, status, received_at) '
+            'VALUES (?, ?, ?, ?, CAST(strftime(\'%s\', \'now\') AS INTEGER))',
+            (update_id, chat_id, json.dumps(update), UPDATE_STATUS_QUEUED)
+        )
+        return cursor.rowcount == 1
+
+
+def forget_telegram_update(update_id):
+    with get_db() as conn:
+        conn.execute('DELETE FROM telegram_updates WHERE update_id = ?', (update_id,))
+
+
+def claim_telegram_update(update_id):
+    """Mark an update processing under this process's lease; False if another worker has it."""
+    start_lease_renewal()
+    with get_db() as conn:
+        cursor = conn.execute(
+            f'UPDATE telegram_updates SET status = ?, lease_owner = ?, lease_expires_at = {LEASE_EXPIRY_SQL} '
+            f'WHERE update_id = ? AND {LEASE_CLAIMABLE_SQL}',
+            (UPDATE_STATUS_PROCESSING, worker_id(), WORK_LEASE_SECONDS, update_id,
+             UPDATE_STATUS_QUEUED, UPDATE_STATUS_PROCESSING)
+        )
+        return cursor.rowcount == 1
+
+
+def mark_telegram_update_processed(update_id):
+    with get_db() as conn:
+        conn.execute(
+            'UPDATE telegram_updates SET status = ?, lease_owner = NULL, lease_expires_at = NULL WHERE update_id = ?',
+            (UPDATE_STATUS_PROCESSED, update_id)
+        )
+
+
+telegram_update_queues = []
+telegram_workers_lock = threading.Lock()
+
+
+def telegram_update_worker(update_queue):
+    while True:
+        update_id, update = update_queue.get()
+        try:
+            if update_id is not None and not claim_telegram_update(update_id):
+                # Already processed, or being processed by another worker.
+                update_queue.task_done()
+                continue
+        except Exception as exc:
+            print(f'Failed to claim Telegram update {update_id}: {exc}')
+            update_queue.task_done()
+            continue
+        try:
+            handle_telegram_update(update)
+        except Exception as exc:
+            print(f'Telegram update {update_id} failed: {exc}')
+        finally:
+            try:
+                if update_id is not None:
+                    mark_telegram_update_processed(update_id)
+            except Exception as exc:
+                print(f'Failed to mark Telegram update {update_id} processed: {exc}')
+            update_queue.task_done()
+
+
+def start_telegram_workers():
+    with telegram_workers_lock:
+        if telegram_update_queues:
+            return
+        for index in range(TELEGRAM_WORKERS):
+            update_queue = queue.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+            threading.Thread(
+                target=telegram_update_worker,
+                args=(update_queue,),
+                name=f'telegram-update-{index}',
+                daemon=True
+            ).start()
+            telegram_update_queues.append(update_queue)
+
+
+def enqueue_telegram_update(update_id, chat_id, update):
+    """Queue an update on the worker owning its chat, so each chat is handled in order."""
+    start_telegram_workers()
+    shard = zlib.crc32((chat_id or str(update_id)).encode('utf-8')) % len(telegram_update_queues)
+    try:
+        telegram_update_queues[shard].put_nowait((update_id, update))
+    except queue.Full:
+        return False
+    return True
+
+
+def resume_pending_telegram_updates():
+    """Re-queue acknowledged updates that are still queued or whose processing lease has expired."""
+    with get_db() as conn:
+        rows = conn.execute(
+            f'SELECT update_id, chat_id, payload FROM telegram_updates WHERE {LEASE_CLAIMABLE_SQL} ORDER BY update_id',
+            (UPDATE_STATUS_QUEUED, UPDATE_STATUS_PROCESSING)
+        ).fetchall()
+    for row in rows:
+        if not enqueue_telegram_update(row['update_id'], row['chat_id'], json.loads(row['payload'])):
+            break
 
 
 @app.route('/telegram/webhook', methods=['POST'])
@@ -744,7 +2450,19 @@ def telegram_webhook():
         if secret_header != TELEGRAM_WEBHOOK_SECRET:
             return jsonify({'error': 'Invalid webhook secret'}), 403
     update = request.get_json(silent=True) or {}
-    process_telegram_update(update)
+    if TELEGRAM_UPDATE_MODE != 'async':
+        handle_telegram_update(update)
+        return jsonify({'ok': True}), 200
+
+    update_id = update.get('update_id')
+    chat_id = telegram_update_chat_id(update)
+    if update_id is not None and not record_telegram_update(update_id, chat_id, update):
+        return jsonify({'ok': True, 'duplicate': True}), 200
+    if not enqueue_telegram_update(update_id, chat_id, update):
+        # Let Telegram redeliver this update later instead of dropping it as a duplicate.
+        if update_id is not None:
+            forget_telegram_update(update_id)
+        return jsonify({'error': 'Telegram update queue is full'}), 503
     return jsonify({'ok': True}), 200
 
 
@@ -762,7 +2480,7 @@ def setup_telegram_webhook():
 
     try:
         telegram_api_call('setWebhook', payload)
-    except (RuntimeError, HTTPError, URLError) as exc:
+    except RuntimeError as exc:
         return jsonify({'error': f'Failed to set webhook: {exc}'}), 502
 
     return jsonify({
@@ -777,7 +2495,7 @@ def telegram_webhook_info():
         return jsonify({'error': 'Telegram bot token is not configured'}), 500
     try:
         info = telegram_api_call('getWebhookInfo')
-    except (RuntimeError, HTTPError, URLError) as exc:
+    except RuntimeError as exc:
         return jsonify({'error': f'Failed to fetch webhook info: {exc}'}), 502
     return jsonify(info), 200
 
@@ -795,10 +2513,35 @@ def get_documents(id):
     return jsonify(result)
 
 
+def document_offload_response(file_path, mime_type):
+    """Empty response telling the front proxy which file to stream, or None.
+
+    X-Accel-Redirect needs an nginx ``internal`` location at
+    DOCUMENT_ACCEL_PREFIX that aliases UPLOAD_FOLDER.
+    """
+    if DOCUMENT_OFFLOAD == 'x-sendfile':
+        response = Response(mimetype=mime_type)
+        response.headers['X-Sendfile'] = os.path.abspath(file_path)
+        return response
+    if DOCUMENT_OFFLOAD == 'x-accel-redirect':
+        relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(app.config['UPLOAD_FOLDER']))
+        if relative.startswith('..'):
+            return None
+        response = Response(mimetype=mime_type)
+        response.headers['X-Accel-Redirect'] = (
+            DOCUMENT_ACCEL_PREFIX.rstrip('/') + '/' + urllib_parse.quote(relative.replace(os.sep, '/'))
+        )
+        return response
+    return None
+
+
 @app.route('/documents/<doc_id>/file', methods=['GET'])
 def get_document_file(doc_id):
     with get_db() as conn:
-        doc = conn.execute('SELECT path FROM documents WHERE id = ?', (doc_id,)).fetchone()
+        doc = conn.execute(
+            'SELECT d.path, d.sha256, b.mime_type FROM documents d LEFT JOIN blobs b ON b.sha256 = d.sha256 WHERE d.id = ?',
+            (doc_id,)
+        ).fetchone()
     if not doc:
         return jsonify({'error': 'Document not found'}), 404
 
@@ -806,34 +2549,98 @@ def get_document_file(doc_id):
     if not file_path or not os.path.exists(file_path):
         return jsonify({'error': 'Document file missing'}), 404
 
-    return send_file(file_path, as_attachment=False)
+    # Blob paths have no extension, so the MIME type comes from the blobs table.
+    mime_type = doc['mime_type'] or guess_mime_type(file_path)
+    sha256 = doc['sha256']
+
+    response = document_offload_response(file_path, mime_type)
+    offloaded = response is not None
+    if offloaded:
+        if sha256:
+            response.set_etag(sha256)
+    else:
+        # conditional=True answers If-None-Match with 304 and Range with 206.
+        response = send_file(
+            file_path, mimetype=mime_type, as_attachment=False, conditional=True, etag=sha256 or True
+        )
+
+    # A document id always maps to the same bytes once its content hash is
+    # known, so those can be cached for good. Documents hold personal data,
+    # hence private.
+    response.cache_control.private = True
+    if sha256:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = DOCUMENT_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    if offloaded:
+        # The proxy serves the bytes (and Range); a matching ETag still gets a 304 here.
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            # nginx would follow the offload header whatever the status and send the whole file.
+            response.headers.pop('X-Accel-Redirect', None)
+            response.headers.pop('X-Sendfile', None)
+    return response
+
+
+def forget_cached_extraction(candidate):
+    """Drop the candidate's resume from the extraction cache, which holds contact fields."""
+    if not extraction_cache:
+        return
+    text_sha256 = candidate['resume_text_sha256']
+    if not text_sha256 and candidate['resume_path'] and os.path.exists(candidate['resume_path']):
+        # Rows saved before resume_text_sha256 existed: re-read the resume for its digest.
+        # Blob paths have no extension, so the parser follows the blob's MIME type.
+        file_type = None
+        if candidate['resume_sha256']:
+            with get_db() as conn:
+                blob = conn.execute(
+                    'SELECT mime_type FROM blobs WHERE sha256 = ?', (candidate['resume_sha256'],)
+                ).fetchone()
+            extension = mimetypes.guess_extension(blob['mime_type']) if blob and blob['mime_type'] else None
+            file_type = extension.lstrip('.') if extension else None
+        text = extract_text_from_file(candidate['resume_path'], file_type=file_type)
+        text_sha256 = ExtractionCache.text_digest(normalize_text(text)) if text else None
+    if text_sha256:
+        extraction_cache.forget(text_sha256)
 
 
 @app.route('/candidates/<id>', methods=['DELETE'])
 def delete_candidate(id):
     with get_db() as conn:
         candidate = conn.execute(
-            'SELECT id, resume_path FROM candidates WHERE id = ?',
+            'SELECT id, resume_path, resume_sha256, resume_text_sha256 FROM candidates WHERE id = ?',
             (id,)
         ).fetchone()
         if not candidate:
             return jsonify({'error': 'Candidate not found'}), 404
 
         documents = conn.execute(
-            'SELECT path FROM documents WHERE candidate_id = ?',
+            'SELECT path, sha256 FROM documents WHERE candidate_id = ?',
             (id,)
         ).fetchall()
 
+    # Blob-store files are shared by content and only unlinked with their last
+    # reference; legacy flat files (no hash) are removed directly.
+    blob_hashes = []
     file_paths = []
-    if candidate['resume_path']:
-        file_paths.append(candidate['resume_path'])
-    file_paths.extend([doc['path'] for doc in documents if doc['path']])
+    for path, sha256 in [(candidate['resume_path'], candidate['resume_sha256'])] + [
+        (doc['path'], doc['sha256']) for doc in documents
+    ]:
+        if sha256:
+            blob_hashes.append(sha256)
+        elif path:
+            file_paths.append(path)
 
     with get_db() as conn:
         conn.execute('DELETE FROM documents WHERE candidate_id = ?', (id,))
         conn.execute('DELETE FROM requests WHERE candidate_id = ?', (id,))
+        conn.execute('DELETE FROM candidate_skills WHERE candidate_id = ?', (id,))
         conn.execute('DELETE FROM candidates WHERE id = ?', (id,))
 
+    forget_cached_extraction(candidate)
+    release_blobs(blob_hashes)
     for path in file_paths:
         try:
             if os.path.exists(path):
@@ -843,7 +2650,113 @@ def delete_candidate(id):
 
     return jsonify({'message': 'Candidate profile and files deleted permanently'}), 200
 
+def migrate_uploads():
+    """Move flat UPLOAD_FOLDER files referenced by old rows into the blob store."""
+    with get_db() as conn:
+        targets = [
+            ('candidates', 'resume_path', 'resume_sha256', row['id'], row['resume_path'])
+            for row in conn.execute(
+                "SELECT id, resume_path FROM candidates WHERE resume_sha256 IS NULL AND COALESCE(resume_path, '') != ''"
+            ).fetchall()
+        ] + [
+            ('documents', 'path', 'sha256', row['id'], row['path'])
+            for row in conn.execute(
+                "SELECT id, path FROM documents WHERE sha256 IS NULL AND COALESCE(path, '') != ''"
+            ).fetchall()
+        ]
+
+    migrated = missing = 0
+    legacy_paths = set()
+    for table, path_column, sha_column, row_id, path in targets:
+        if not os.path.exists(path):
+            missing += 1
+            continue
+        # Copy rather than move: before hashing, several rows could share one flat file.
+        sha256, blob_path = store_blob(path, guess_mime_type(path), keep_source=True)
+        with get_db() as conn:
+            conn.execute(f'UPDATE {table} SET {path_column} = ?, {sha_column} = ? WHERE id = ?', (blob_path, sha256, row_id))
+        legacy_paths.add(path)
+        migrated += 1
+
+    for path in legacy_paths:
+        os.remove(path)
+    return {'migrated': migrated, 'missing': missing, 'files_removed': len(legacy_paths)}
+
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads_command():
+    """Move existing uploads into the content-addressable blob store."""
+    print(json.dumps(migrate_uploads()))
+
+
+maintenance_lock_file = None
+
+
+def acquire_maintenance_lock():
+    """Return True in the one process per database that replays pending work and prunes.
+
+    The lock is held for the life of the process, so with several WSGI workers
+    only the first one to start does this.
+    """
+    global maintenance_lock_file
+    if fcntl is None:
+        return True
+    lock_file = open(f'{DATABASE}.maintenance.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    maintenance_lock_file = lock_file
+    return True
+
+
+def maintenance_loop():
+    # Replay runs every lease period so work left by a crashed sibling is picked up.
+    last_pruned = time.monotonic()
+    while True:
+        time.sleep(min(MAINTENANCE_INTERVAL_SECONDS, WORK_LEASE_SECONDS))
+        try:
+            resume_pending_ingestion_jobs()
+            resume_pending_telegram_updates()
+            if time.monotonic() - last_pruned >= MAINTENANCE_INTERVAL_SECONDS:
+                prune_change_log()
+                prune_telegram_updates()
+                last_pruned = time.monotonic()
+        except Exception as exc:
+            print(f'Maintenance failed: {exc}')
+
+
+background_tasks_lock = threading.Lock()
+background_tasks_started = False
+
+
+def start_background_tasks():
+    """Replay pending work and start periodic maintenance, once per serving process."""
+    global background_tasks_started
+    with background_tasks_lock:
+        if background_tasks_started:
+            return
+        background_tasks_started = True
+    if not acquire_maintenance_lock():
+        return
+    resume_pending_ingestion_jobs()
+    resume_pending_telegram_updates()
+    threading.Thread(target=maintenance_loop, name='maintenance', daemon=True).start()
+
+
+@app.before_request
+def start_background_tasks_when_serving():
+    # Started by the first request rather than on import, so `flask` CLI
+    # commands and shells that import the app never claim or replay work.
+    if not background_tasks_started:
+        start_background_tasks()
+
+
 if __name__ == '__main__':
+    # The file-watching parent of the debug reloader serves nothing.
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     host = os.environ.get('HOST', '127.0.0.1')
     port = int(os.environ.get('PORT', 5000))
     app.run(host=host, port=port, debug=app.config['DEBUG'])
@@ -0,0 +1,123 @@
+import re
+
+
+KIND_PAN = 'pan'
+KIND_AADHAAR = 'aadhaar'
+KIND_INVALID_PAN = 'invalid_pan'
+KIND_INVALID_AADHAAR = 'invalid_aadhaar'
+KIND_WHERE_TO_SEND = 'where_to_send'
+KIND_DONE = 'done'
+KIND_GREETING = 'greeting'
+KIND_THANKS = 'thanks'
+KIND_FREE_FORM = 'free_form'
+
+# Fourth PAN character is the holder type: person, company, HUF, firm, AOP,
+# trust, BOI, local authority, artificial juridical person, government.
+PAN_PATTERN = re.compile(r'(?<![A-Z0-9])([A-Z]{3}[ABCFGHLJPT][A-Z][0-9]{4}[A-Z])(?![A-Z0-9])')
+PAN_LIKE_PATTERN = re.compile(r'(?<![A-Z0-9])([A-Z]{4,6}[0-9]{3,5}[A-Z]{0,2})(?![A-Z0-9])')
+DIGIT_GROUP_PATTERN = re.compile(r'(?<![0-9])([0-9](?:[ -]?[0-9]){10,12})(?![0-9])')
+MASKED_AADHAAR_PATTERN = re.compile(r'(?<![0-9A-Z*])([X*]{4}[ -]?[X*]{4}[ -]?[0-9]{4})(?![0-9])')
+
+WHERE_TO_SEND_PATTERN = re.compile(
+    r'\b(where|how|what)\b.*\b(send|upload|share|submit|attach|need|required)\b'
+)
+DONE_PATTERN = re.compile(
+    r"^(done|finished|completed|sent|uploaded|sent it|uploaded it|already sent|that'?s all|all done)$"
+)
+GREETING_PATTERN = re.compile(r'^(hi+|hello|hey|hii|good (morning|afternoon|evening))( there)?$')
+THANKS_PATTERN = re.compile(r'^(thanks|thank you|thank you so much|thx|ty|ok|okay|ok thanks|okay thanks)$')
+# Words allowed around a rejected PAN/Aadhaar token, as in "my pan no is ...".
+TOKEN_FILLER_WORDS = {
+    'MY', 'PAN', 'AADHAAR', 'AADHAR', 'ADHAAR', 'ADHAR', 'UID', 'CARD', 'NO', 'NUMBER', 'NUM', 'IS', 'HERE', 'IT',
+}
+
+VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 6, 8, 7, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+
+
+def verhoeff_valid(digits):
+    check = 0
+    for index, digit in enumerate(reversed(digits)):
+        check = VERHOEFF_D[check][VERHOEFF_P[index % 8][int(digit)]]
+    return check == 0
+
+
+def is_valid_aadhaar(digits):
+    return len(digits) == 12 and digits.isdigit() and digits[0] not in '01' and verhoeff_valid(digits)
+
+
+def is_bare_token(upper, start, end):
+    """True when the message is just the token at ``upper[start:end]``, give or take filler words."""
+    rest = re.findall(r'[A-Z0-9]+', upper[:start] + ' ' + upper[end:])
+    return all(word in TOKEN_FILLER_WORDS for word in rest)
+
+
+def normalize_intent_text(text):
+    return re.sub(r'\s+', ' ', re.sub(r'[^a-z0-9\' ]', ' ', text.lower())).strip()
+
+
+def recognize_message(text):
+    """Classify a Telegram text message without calling the LLM.
+
+    Returns ``(kind, value)``. ``value`` is the normalized PAN or Aadhaar number
+    for ``pan``/``aadhaar`` (masked Aadhaar keeps its mask), the rejected token
+    for the ``invalid_*`` kinds, and None otherwise. Text that matches nothing
+    is ``free_form`` and is left to Mr Traqchecker. The ``invalid_*`` kinds are
+    only returned when the message is essentially that token, so numbers and
+    codes inside ordinary sentences also go to Mr Traqchecker.
+    """
+    raw = (text or '').strip()
+    upper = raw.upper()
+
+    match = PAN_PATTERN.search(upper)
+    if match:
+        return KIND_PAN, match.group(1)
+
+    masked = MASKED_AADHAAR_PATTERN.search(upper)
+    if masked:
+        return KIND_AADHAAR, re.sub(r'[ -]', '', masked.group(1)).replace('*', 'X')
+
+    invalid_aadhaar = None
+    for group in DIGIT_GROUP_PATTERN.finditer(upper):
+        digits = re.sub(r'[ -]', '', group.group(1))
+        if is_valid_aadhaar(digits):
+            return KIND_AADHAAR, digits
+        if invalid_aadhaar is None and is_bare_token(upper, *group.span(1)):
+            invalid_aadhaar = digits
+    if invalid_aadhaar:
+        return KIND_INVALID_AADHAAR, invalid_aadhaar
+
+    pan_like = PAN_LIKE_PATTERN.search(upper)
+    if pan_like and is_bare_token(upper, *pan_like.span(1)):
+        return KIND_INVALID_PAN, pan_like.group(1)
+
+    intent = normalize_intent_text(raw)
+    if DONE_PATTERN.match(intent):
+        return KIND_DONE, None
+    if GREETING_PATTERN.match(intent):
+        return KIND_GREETING, None
+    if THANKS_PATTERN.match(intent):
+        return KIND_THANKS, None
+    if WHERE_TO_SEND_PATTERN.search(intent) and len(intent) <= 80:
+        return KIND_WHERE_TO_SEND, None
+    return KIND_FREE_FORM, None
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import threading
+
+
+class BlobStore:
+    """Content-addressable file store sharded as ``<root>/ab/cd/<sha256>``.
+
+    Files are named by the SHA-256 of their bytes, so storing the same content
+    twice keeps a single copy. Reference counts live in the application
+    database; ``lock`` serializes "store + add reference" against "drop
+    reference + unlink" within this process.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.RLock()
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """Return ``(sha256_hexdigest, size)`` of a file."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                digest.update(chunk)
+        return digest.hexdigest(), size
+
+    def put(self, src_path, sha256):
+        """Move ``src_path`` into the store under ``sha256``; returns the blob path.
+
+        When the blob already exists the source file is discarded instead.
+        ``src_path`` should be on the same filesystem as the store.
+        """
+        dest = self.path_for(sha256)
+        if os.path.exists(dest):
+            os.remove(src_path)
+            return dest
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(src_path, dest)
+        return dest
+
+    def copy_in(self, src_path, sha256):
+        """Like ``put`` but leaves ``src_path`` in place."""
+        dest = self.path_for(sha256)
+        if os.path.exists(dest):
+            return dest
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = f'{dest}.{os.getpid()}.{threading.get_ident()}.part'
+        try:
+            with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return dest
+
+    def remove(self, sha256):
+        path = self.path_for(sha256)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        # Drop now-empty shard directories; they are recreated on demand.
+        for directory in (os.path.dirname(path), os.path.dirname(os.path.dirname(path))):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
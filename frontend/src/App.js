@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useDropzone } from 'react-dropzone';
 import axios from 'axios';
 import './App.css';
@@ -91,11 +91,17 @@ function App() {
     return [];
   };
 
+  const changeCursorRef = useRef(null);
+  const selectedCandidateIdRef = useRef(null);
+
   const fetchCandidates = useCallback(async (isSilent = false) => {
     if (!isSilent) {
       setIsLoadingCandidates(true);
     }
     try {
+      // Take the change cursor before the list so no change between the two calls is missed.
+      const changesResponse = await axios.get(`${API_BASE}/candidates/changes`);
+      changeCursorRef.current = changesResponse.data.cursor;
       const response = await axios.get(`${API_BASE}/candidates`);
       console.log('API Call: GET /candidates', {}, 'Response:', response.data);
       setCandidates(response.data);
@@ -116,15 +122,63 @@ function App() {
     }
   }, []);
 
+  const syncCandidateChanges = useCallback(async () => {
+    if (changeCursorRef.current === null) {
+      fetchCandidates(true);
+      return;
+    }
+    try {
+      let hasMore = true;
+      while (hasMore) {
+        const response = await axios.get(`${API_BASE}/candidates/changes`, {
+          params: { since: changeCursorRef.current }
+        });
+        const changes = response.data;
+        if (changes.reset) {
+          fetchCandidates(true);
+          return;
+        }
+        changeCursorRef.current = changes.cursor;
+        hasMore = changes.has_more;
+
+        if (changes.candidates.length || changes.deleted.length) {
+          const deletedIds = new Set(changes.deleted);
+          setCandidates((prev) => {
+            const updatedById = new Map(changes.candidates.map((candidate) => [candidate.id, candidate]));
+            const merged = prev
+              .filter((candidate) => !deletedIds.has(candidate.id))
+              .map((candidate) => {
+                const updated = updatedById.get(candidate.id);
+                updatedById.delete(candidate.id);
+                return updated || candidate;
+              });
+            return [...merged, ...updatedById.values()];
+          });
+        }
+
+        const selectedId = selectedCandidateIdRef.current;
+        if (selectedId && changes.documents.some((doc) => doc.candidate_id === selectedId)) {
+          const docsResponse = await axios.get(`${API_BASE}/candidates/${selectedId}/documents`);
+          setDocuments(docsResponse.data);
+        }
+      }
+      setCandidateFetchFailed(false);
+    } catch (error) {
+      console.error('Error syncing candidate changes:', error);
+      setCandidateFetchFailed(true);
+    }
+  }, [fetchCandidates]);
+
   useEffect(() => {
     fetchCandidates();
     const intervalId = setInterval(() => {
-      fetchCandidates(true);
+      syncCandidateChanges();
     }, 12000);
     return () => clearInterval(intervalId);
-  }, [fetchCandidates]);
+  }, [fetchCandidates, syncCandidateChanges]);
 
   useEffect(() => {
+    selectedCandidateIdRef.current = selectedCandidate ? selectedCandidate.id : null;
     if (!selectedCandidate) {
       setTelegramUsername('');
       return;
@@ -1,19 +1,226 @@
+import hashlib
 import json
 import os
 import re
+import sqlite3
+import threading
+import time
 import logging
+import multiprocessing
+import signal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 from docx import Document
+from dotenv import load_dotenv
 from openai import OpenAI
 from PyPDF2 import PdfReader
 
+from metrics import OPENAI_REQUEST_SECONDS, record_openai_usage, registry
+from tracing import bind_context, tracer
+
 logging.getLogger("PyPDF2").setLevel(logging.ERROR)
 
+# app.py imports this module before it loads .env, so settings read below
+# would otherwise only see the process environment.
+load_dotenv()
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+# Bump whenever base_prompt/verifier_prompt or result post-processing changes
+# so cached extractions from older prompts are not served.
+EXTRACTION_PROMPT_VERSION = "4"
+
+# "single" asks for every field in one function-calling request; "dual" adds the
+# skills/company_history verifier pass for higher recall at twice the input tokens.
+EXTRACTION_MODE_SINGLE = "single"
+EXTRACTION_MODE_DUAL = "dual"
+EXTRACTION_MODES = (EXTRACTION_MODE_SINGLE, EXTRACTION_MODE_DUAL)
+RESUME_EXTRACTION_MODE = os.getenv("RESUME_EXTRACTION_MODE", EXTRACTION_MODE_SINGLE).lower()
+if RESUME_EXTRACTION_MODE not in EXTRACTION_MODES:
+    print(f"Unknown RESUME_EXTRACTION_MODE {RESUME_EXTRACTION_MODE!r}, using {EXTRACTION_MODE_SINGLE!r}")
+    RESUME_EXTRACTION_MODE = EXTRACTION_MODE_SINGLE
+
+LLM_CONCURRENT_PASSES = os.getenv("RESUME_LLM_CONCURRENT", "true").lower() == "true"
+# Resume text longer than this many (estimated) tokens is split into chunks that
+# are extracted concurrently; chunks past RESUME_MAX_CHUNKS are dropped.
+PROMPT_TOKEN_BUDGET = int(os.getenv("RESUME_PROMPT_TOKEN_BUDGET", "6000"))
+MAX_CHUNKS = int(os.getenv("RESUME_MAX_CHUNKS", "8"))
+LLM_CALL_TIMEOUT = float(os.getenv("RESUME_LLM_TIMEOUT", "45"))
+
+_llm_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RESUME_LLM_WORKERS", "8")),
+    thread_name_prefix="resume-llm",
+)
+
+
+class LLMCall:
+    """A call on the shared LLM pool whose timeout counts from when it starts running.
+
+    The pool is shared by every extraction, so time spent queued behind other
+    resumes must not count against a pass.
+    """
+
+    def __init__(self, func, *args):
+        self._started = threading.Event()
+        self._started_at = None
+        self.future = _llm_executor.submit(bind_context(self._run), func, args)
+
+    def _run(self, func, args):
+        self._started_at = time.monotonic()
+        self._started.set()
+        return func(*args)
+
+    def result(self, timeout):
+        """Wait for the call to start, then at most until ``timeout`` seconds after it started."""
+        self._started.wait()
+        return self.future.result(timeout=max(self._started_at + timeout - time.monotonic(), 0))
+
+# Text extraction limits. Files are read on one shared pool of TEXT_WORKERS
+# processes so a stuck parse can be killed; PDFs with at least
+# TEXT_PARALLEL_MIN_PAGES pages are split across several of its workers.
+TEXT_TIMEOUT = float(os.getenv("RESUME_TEXT_TIMEOUT", "60"))
+TEXT_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "50"))
+TEXT_PARALLEL_MIN_PAGES = int(os.getenv("RESUME_PARALLEL_MIN_PAGES", "12"))
+TEXT_WORKERS = int(os.getenv("RESUME_TEXT_WORKERS", str(min(4, os.cpu_count() or 1))))
+SLOW_PAGE_SECONDS = float(os.getenv("RESUME_SLOW_PAGE_SECONDS", "2"))
+
+CACHE_ENABLED = os.getenv("RESUME_CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("RESUME_CACHE_PATH", "resume_cache.db")
+CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = int(os.getenv("RESUME_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
 
 class ResumeExtractionError(Exception):
     """Raised when resume parsing fails and data should not be persisted."""
 
 
+class ExtractionCache:
+    """Persistent cache of extraction results keyed on normalized resume text.
+
+    Entries expire after ``ttl_seconds`` and the least recently used ones are
+    evicted once the cache holds more than ``max_entries``.
+    """
+
+    def __init__(self, path, max_entries, ttl_seconds):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS extraction_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT,
+                    created_at REAL,
+                    accessed_at REAL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extraction_cache_accessed ON extraction_cache(accessed_at)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def text_digest(normalized_text):
+        return hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(normalized_text, mode=RESUME_EXTRACTION_MODE, version=EXTRACTION_PROMPT_VERSION, model=OPENAI_MODEL):
+        return f"{version}:{model}:{mode}:{ExtractionCache.text_digest(normalized_text)}"
+
+    def get(self, key):
+        now = time.time()
+        row = None
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    row = conn.execute(
+                        "SELECT result, created_at FROM extraction_cache WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                    if row and now - row[1] > self.ttl_seconds:
+                        conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+                        row = None
+                    elif row:
+                        conn.execute(
+                            "UPDATE extraction_cache SET accessed_at = ? WHERE key = ?",
+                            (now, key),
+                        )
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            print(f"Extraction cache read failed: {exc}")
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, result):
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO extraction_cache (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(result), now, now),
+                    )
+                    expired = conn.execute(
+                        "DELETE FROM extraction_cache WHERE created_at < ?",
+                        (now - self.ttl_seconds,),
+                    ).rowcount
+                    overflow = conn.execute(
+                        "DELETE FROM extraction_cache WHERE key IN ("
+                        "SELECT key FROM extraction_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,),
+                    ).rowcount
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            print(f"Extraction cache write failed: {exc}")
+            return
+        with self._lock:
+            self.evictions += expired + overflow
+
+    def forget(self, text_digest):
+        """Drop every cached result for one resume text, across modes and versions."""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM extraction_cache WHERE substr(key, -64) = ?", (text_digest,))
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            print(f"Extraction cache delete failed: {exc}")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+extraction_cache = ExtractionCache(CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS) if CACHE_ENABLED else None
+
+registry.callback(
+    "resume_extraction_cache_events_total",
+    "Extraction cache hits, misses and evictions.",
+    "counter",
+    lambda: {(event,): count for event, count in extraction_cache.stats().items()} if extraction_cache else {},
+    ("event",),
+)
+
+
 MONTH_MAP = {
     "jan": 1,
     "january": 1,
@@ -138,24 +345,345 @@ def sort_company_history(company_history):
     return deduped
 
 
-def extract_text_from_file(file_path):
+PAGE_BREAK = "\f"
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_PATTERN = re.compile(r"(?<![\w+])\+?\d[\d ().-]{8,18}\d(?![\w])")
+MONTH_NAMES = "|".join(sorted(MONTH_MAP, key=len, reverse=True))
+DATE_TOKEN = rf"(?:(?:{MONTH_NAMES})\.?\s+\d{{4}}|\d{{1,2}}/\d{{4}}|\d{{4}})"
+DATE_RANGE_PATTERN = re.compile(
+    rf"\b({DATE_TOKEN})\s*(?:-|\u2013|\u2014|to)\s*({DATE_TOKEN}|present|current|now|till date)\b",
+    re.IGNORECASE,
+)
+PAGE_NUMBER_PATTERN = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$|^-\s*\d{1,3}\s*-$", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    # Rough OpenAI tokenizer average for English text: about 4 characters per token.
+    return len(text or "") // 4 + 1
+
+
+def boilerplate_key(line):
+    # Short numbers are masked so "Page 2" footers match; years are kept.
+    return re.sub(r"(?<!\d)\d{1,3}(?!\d)", "#", normalize_text(line).lower())
+
+
+def strip_boilerplate(pages, edge_lines=3):
+    """Drop page-number lines and headers/footers repeated across PDF pages.
+
+    A line counts as a header/footer when it appears (ignoring page numbers) within
+    ``edge_lines`` of the top or bottom of at least half of the pages. The first
+    page keeps its copy, since resume headers usually carry the candidate's name.
+    """
+    page_lines = [[line for line in page.split("\n") if normalize_text(line)] for page in pages]
+    page_lines = [
+        [line for line in lines if not PAGE_NUMBER_PATTERN.match(normalize_text(line))] for lines in page_lines
+    ]
+    if len(page_lines) < 2:
+        return ["\n".join(lines) for lines in page_lines]
+
+    counts = {}
+    for lines in page_lines:
+        for key in {boilerplate_key(line) for line in lines[:edge_lines] + lines[-edge_lines:]}:
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(2, (len(page_lines) + 1) // 2)
+    repeated = {key for key, count in counts.items() if count >= threshold}
+
+    cleaned = ["\n".join(page_lines[0])]
+    for lines in page_lines[1:]:
+        last = len(lines) - edge_lines
+        cleaned.append("\n".join(
+            line for index, line in enumerate(lines)
+            if not ((index < edge_lines or index >= last) and boilerplate_key(line) in repeated)
+        ))
+    return cleaned
+
+
+def is_plausible_phone(candidate):
+    """Reject date ranges, ISBNs and other digit runs PHONE_PATTERN also matches."""
+    digits = re.sub(r"\D", "", candidate)
+    if not 10 <= len(digits) <= 13:
+        return False
+    # "01.2019 - 12.2020" and similar period shapes.
+    if "." in candidate or re.search(r"\s-\s", candidate):
+        return False
+    groups = re.findall(r"\d+", candidate)
+    if candidate.startswith("+"):
+        groups = groups[1:]
+    # Phone groupings are 2+ digits; "978-3-16-148410-0" is not.
+    return len(groups) <= 4 and all(len(group) >= 2 for group in groups)
+
+
+def pre_extract(text):
+    """Find emails, phone numbers and date ranges without the LLM."""
+    emails = unique_keep_order(EMAIL_PATTERN.findall(text))
+    phones = [match.strip() for match in PHONE_PATTERN.findall(text) if is_plausible_phone(match.strip())]
+    date_ranges = unique_keep_order(f"{start} - {end}" for start, end in DATE_RANGE_PATTERN.findall(text))
+    return {"emails": emails, "phones": unique_keep_order(phones), "date_ranges": date_ranges}
+
+
+def snap_durations(company_history, date_ranges):
+    """Replace LLM durations with the matching date range as written in the resume."""
+    by_key = {}
+    for date_range in date_ranges:
+        by_key.setdefault(parse_duration_sort_key(date_range), date_range)
+    for item in company_history:
+        key = parse_duration_sort_key(item.get("duration", ""))
+        if key != (0, 0, 0, 0) and key in by_key:
+            item["duration"] = by_key[key]
+    return company_history
+
+
+def split_long_page(page, token_budget):
+    if estimate_tokens(page) <= token_budget:
+        return [page]
+    max_chars = token_budget * 4
+    pieces, current, size = [], [], 0
+    for line in page.split("\n"):
+        for start in range(0, max(len(line), 1), max_chars):
+            part = line[start:start + max_chars]
+            if current and size + len(part) > max_chars:
+                pieces.append("\n".join(current))
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def split_into_chunks(pages, token_budget=None):
+    """Group pages into chunks of at most ``token_budget`` tokens.
+
+    Pages are kept whole where possible; a page over the budget is split on
+    line boundaries.
+    """
+    token_budget = token_budget or PROMPT_TOKEN_BUDGET
+    chunks, current, used = [], [], 0
+    for page in pages:
+        if not page:
+            continue
+        for piece in split_long_page(page, token_budget):
+            tokens = estimate_tokens(piece)
+            if current and used + tokens > token_budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks or [""]
+
+
+def iter_pdf_pages(reader, start, stop):
+    """Yield ``(text, seconds)`` for pages ``start``..``stop - 1`` of a PdfReader."""
+    for index in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        yield text, time.perf_counter() - started
+
+
+def extract_pdf_page_range(task):
+    """Process-pool worker: extract pages ``[start, stop)`` of ``file_path``."""
+    file_path, start, stop = task
+    return list(iter_pdf_pages(PdfReader(file_path), start, stop))
+
+
+def read_pdf_start(task):
+    """Process-pool worker: parse a PDF and return ``(page_count, pages)``.
+
+    ``pages`` holds the first ``max_pages`` pages, or is None when the PDF has
+    at least ``split_min_pages`` pages and should be split across workers.
+    """
+    file_path, max_pages, split_min_pages = task
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    if min(page_count, max_pages) >= split_min_pages:
+        return page_count, None
+    return page_count, list(iter_pdf_pages(reader, 0, min(page_count, max_pages)))
+
+
+def iter_docx_pages(file_path):
+    # DOCX has no page boundaries, so the whole body is one page.
+    started = time.perf_counter()
+    doc = Document(file_path)
+    text = "\n".join(para.text for para in doc.paragraphs)
+    yield text, time.perf_counter() - started
+
+
+def read_docx(file_path):
+    """Process-pool worker: return the pages of a DOCX file."""
+    return list(iter_docx_pages(file_path))
+
+
+_text_pool = None
+_text_pool_lock = threading.Lock()
+# One document per pool worker at a time, so a document's deadline is spent
+# reading rather than queued behind other documents.
+_text_slots = threading.BoundedSemaphore(TEXT_WORKERS)
+
+
+_text_pool_pids = None
+# Workers are started from a fresh server process rather than forked from this
+# multithreaded one, where a lock held by another thread could be copied into
+# the child and never released.
+_text_pool_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def report_worker_pid(pids):
+    """Process-pool initializer: announce this worker so kill_text_pool can stop it."""
+    pids.put(os.getpid())
+
+
+def get_text_pool():
+    global _text_pool, _text_pool_pids
+    with _text_pool_lock:
+        if _text_pool is None:
+            _text_pool_pids = _text_pool_context.SimpleQueue()
+            _text_pool = ProcessPoolExecutor(
+                max_workers=TEXT_WORKERS,
+                mp_context=_text_pool_context,
+                initializer=report_worker_pid,
+                initargs=(_text_pool_pids,),
+            )
+        return _text_pool
+
+
+def kill_text_pool(pool):
+    """Terminate the workers of ``pool``; the next get_text_pool() starts a new one.
+
+    A parse stuck past its deadline cannot be interrupted any other way. Other
+    documents running on the same pool fail with BrokenProcessPool and are
+    retried by read_with_pool.
+    """
+    global _text_pool, _text_pool_pids
+    with _text_pool_lock:
+        if _text_pool is not pool:
+            return  # Already killed by another timed-out read.
+        pids = _text_pool_pids
+        _text_pool = _text_pool_pids = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    while not pids.empty():
+        try:
+            os.kill(pids.get(), signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def read_pdf_pages(pool, file_path, max_pages, deadline, parallel, pages, futures):
+    """Fill ``pages`` from ``file_path`` on ``pool``; returns the PDF's page count.
+
+    Submitted futures are appended to ``futures`` so the caller can tell
+    whether a timed-out read was still running.
+    """
+    split_min_pages = TEXT_PARALLEL_MIN_PAGES if parallel and TEXT_WORKERS > 1 else float("inf")
+    first = pool.submit(read_pdf_start, (file_path, max_pages, split_min_pages))
+    futures.append(first)
+    page_count, first_pages = first.result(timeout=max(deadline - time.monotonic(), 0))
+    if first_pages is not None:
+        pages.extend(first_pages)
+        return page_count
+
+    count = min(page_count, max_pages)
+    workers = min(TEXT_WORKERS, count)
+    step = max(1, -(-count // (workers * 2)))
+    ranges = [
+        pool.submit(extract_pdf_page_range, (file_path, start, min(start + step, count)))
+        for start in range(0, count, step)
+    ]
+    futures.extend(ranges)
+    # Ranges come back in order, so a timeout keeps every page before the
+    # first unfinished range.
+    for future in ranges:
+        pages.extend(future.result(timeout=max(deadline - time.monotonic(), 0)))
+    return page_count
+
+
+def read_with_pool(file_path, file_type, max_pages, deadline, parallel):
+    """Read a PDF or DOCX on the shared text pool; returns ``(pages, page_count, timed_out)``.
+
+    The whole read, parsing included, is bounded by ``deadline``. On timeout
+    the pages read so far are returned and, if one of this read's tasks is
+    still running, the pool is killed to stop it. A read broken by another
+    document's timeout is retried once.
+    """
+    for attempt in range(2):
+        pool = get_text_pool()
+        pages, futures = [], []
+        try:
+            if file_type == "pdf":
+                page_count = read_pdf_pages(pool, file_path, max_pages, deadline, parallel, pages, futures)
+            else:
+                futures.append(pool.submit(read_docx, file_path))
+                pages = futures[0].result(timeout=max(deadline - time.monotonic(), 0))
+                page_count = len(pages)
+            return pages, page_count, False
+        except FutureTimeoutError:
+            for future in futures:
+                future.cancel()
+            if any(future.running() for future in futures):
+                kill_text_pool(pool)
+            return pages, None, True
+        except BrokenProcessPool:
+            if attempt or time.monotonic() >= deadline:
+                raise
+
+
+def extract_document(file_path, parallel=True, timeout=None, max_pages=None, file_type=None):
+    """Extract text page by page with a wall-clock timeout and a page cap.
+
+    Returns a dict with ``text`` (pages joined by PAGE_BREAK), ``page_timings``
+    (seconds per page), ``truncated`` (page cap hit), ``timed_out`` and
+    ``seconds``. Reading always runs on the shared text pool, so the timeout
+    also covers parsing; ``parallel`` lets large PDFs use several workers. The
+    timeout starts once the document gets a pool slot. ``file_type`` (``pdf``
+    or ``docx``) defaults to the file extension; blob store paths have none.
+    """
+    file_type = file_type or os.path.splitext(file_path)[1].lower().lstrip(".")
+    if file_type not in ("pdf", "docx"):
+        raise ValueError("Unsupported file type")
+    max_pages = max_pages or TEXT_MAX_PAGES
+    with _text_slots:
+        started = time.monotonic()
+        deadline = started + (TEXT_TIMEOUT if timeout is None else timeout)
+        pages, page_count, timed_out = read_with_pool(file_path, file_type, max_pages, deadline, parallel)
+
+    return {
+        # Pages are separated by PAGE_BREAK so later stages can tell them apart.
+        "text": PAGE_BREAK.join(text + "\n" for text, _ in pages).strip(),
+        "page_timings": [round(seconds, 4) for _, seconds in pages],
+        "truncated": page_count is not None and page_count > max_pages,
+        "timed_out": timed_out,
+        "seconds": round(time.monotonic() - started, 4),
+    }
+
+
+def extract_text_from_file(file_path, parallel=True, file_type=None):
     """Extract text from PDF or DOCX file."""
-    text = ""
-    try:
-        if file_path.lower().endswith(".pdf"):
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += (page.extract_text() or "") + "\n"
-        elif file_path.lower().endswith(".docx"):
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        else:
-            raise ValueError("Unsupported file type")
-    except Exception as exc:
-        print(f"Error extracting text: {exc}")
-        return ""
-    return text.strip()
+    with tracer.span("resume.extract_text", parallel=parallel) as span:
+        try:
+            document = extract_document(file_path, parallel, file_type=file_type)
+        except Exception as exc:
+            print(f"Error extracting text: {exc}")
+            return ""
+        span.set_attribute("pages", len(document["page_timings"]))
+        span.set_attribute("truncated", document["truncated"])
+        span.set_attribute("timed_out", document["timed_out"])
+
+    timings = document["page_timings"]
+    if document["timed_out"]:
+        print(f"Text extraction timed out for {file_path} after {len(timings)} pages ({document['seconds']}s)")
+    if document["truncated"]:
+        print(f"Text extraction stopped at the {TEXT_MAX_PAGES} page cap for {file_path}")
+    if timings and max(timings) > SLOW_PAGE_SECONDS:
+        slowest = max(range(len(timings)), key=timings.__getitem__)
+        print(
+            f"Slow text extraction for {file_path}: {document['seconds']}s total, "
+            f"page {slowest + 1} took {timings[slowest]}s"
+        )
+    return document["text"]
 
 
 def parse_json_from_completion(content):
@@ -170,40 +698,234 @@ def parse_json_from_completion(content):
     return json.loads(result_text)
 
 
-def run_llm_json(client, prompt):
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
+def create_completion(client, prompt_name, **kwargs):
+    """Chat completion call timed, traced and token-counted under ``prompt_name``."""
+    with tracer.span(f"openai.{prompt_name}", model=OPENAI_MODEL) as span:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = client.chat.completions.create(model=OPENAI_MODEL, **kwargs)
+            outcome = "ok"
+        finally:
+            OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - started, prompt=prompt_name, outcome=outcome)
+        usage = getattr(response, "usage", None)
+        record_openai_usage(prompt_name, usage)
+        span.set_attribute("prompt_tokens", getattr(usage, "prompt_tokens", None))
+        span.set_attribute("completion_tokens", getattr(usage, "completion_tokens", None))
+        return response
+
+
+def run_llm_json(client, prompt, timeout=None, prompt_name="base_prompt"):
+    response = create_completion(
+        client,
+        prompt_name,
         messages=[{"role": "user", "content": prompt}],
         max_tokens=1200,
         temperature=0.1,
+        timeout=timeout,
     )
     return parse_json_from_completion(response.choices[0].message.content)
 
 
-def extract_resume_info(file_path):
+COMPANY_HISTORY_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "company": {"type": "string"},
+            "duration": {"type": "string", "description": "Date range as written, e.g. Jan 2022 - Present"},
+            "is_current": {"type": "boolean"},
+        },
+        "required": ["company", "duration", "is_current"],
+    },
+}
+
+RESUME_FIELD_SCHEMAS = {
+    "name": {"type": "string"},
+    "email": {"type": "string"},
+    "phone": {"type": "string"},
+    "company": {"type": "string", "description": "Current or latest company"},
+    "designation": {"type": "string", "description": "Current or latest role title"},
+    "skills": {"type": "array", "items": {"type": "string"}},
+    "company_history": COMPANY_HISTORY_SCHEMA,
+}
+
+RESUME_FIELD_PROMPTS = {
+    "name": "- name: string",
+    "email": "- email: string",
+    "phone": "- phone: string",
+    "company": "- company: string (current/latest company)",
+    "designation": "- designation: string (current/latest role title)",
+    "skills": "- skills: array of strings (as exhaustive as possible, include all explicit technical/domain skills found)",
+    "company_history": (
+        "- company_history: array of objects with keys:\n"
+        "  - company: string\n"
+        "  - duration: string (preserve source format, e.g. \"Jan 2022 - Present\" or \"02/2024 - 07/2025\")\n"
+        "  - is_current: boolean"
+    ),
+}
+
+RESUME_FIELDS = tuple(RESUME_FIELD_SCHEMAS)
+
+
+def resume_function(fields=RESUME_FIELDS):
+    """Function-calling schema asking only for ``fields``."""
+    return {
+        "name": "record_resume",
+        "description": "Record the fields extracted from a resume.",
+        "parameters": {
+            "type": "object",
+            "properties": {field: RESUME_FIELD_SCHEMAS[field] for field in fields},
+            "required": list(fields),
+        },
+    }
+
+
+def run_llm_structured(client, prompt, fields=RESUME_FIELDS, timeout=None, prompt_name="base_prompt"):
+    """Single extraction call that forces the record_resume function schema."""
+    function = resume_function(fields)
+    response = create_completion(
+        client,
+        prompt_name,
+        messages=[{"role": "user", "content": prompt}],
+        tools=[{"type": "function", "function": function}],
+        tool_choice={"type": "function", "function": {"name": function["name"]}},
+        max_tokens=1200,
+        temperature=0.1,
+        timeout=timeout,
+    )
+    message = response.choices[0].message
+    if message.tool_calls:
+        return json.loads(message.tool_calls[0].function.arguments)
+    return parse_json_from_completion(message.content)
+
+
+CHUNK_FIELDS = ("skills", "company_history")
+
+
+def chunk_prompt(chunk_text):
+    field_lines = "\n".join(RESUME_FIELD_PROMPTS[field] for field in CHUNK_FIELDS)
+    return f"""
+This is one part of a longer resume. Extract and return a valid JSON object with EXACT keys:
+{field_lines}
+
+Rules:
+- Use ONLY evidence from this part.
+- Capture every explicit skill mention.
+- Preserve date strings; if a duration includes Present/Current, set is_current=true.
+- If missing, use empty array.
+
+Resume part:
+{chunk_text}
+"""
+
+
+def run_llm_single(client, prompt, fields=RESUME_FIELDS):
+    """Run the single structured pass, retrying once like the dual-pass primary."""
+    try:
+        return run_llm_structured(client, prompt, fields, timeout=LLM_CALL_TIMEOUT)
+    except Exception as exc:
+        print(f"Structured pass failed, retrying: {exc}")
+        return run_llm_structured(client, prompt, fields, timeout=LLM_CALL_TIMEOUT)
+
+
+def run_llm_passes(client, base_prompt, verifier_prompt):
+    """Run the primary and verifier passes, returning (primary, verifier).
+
+    The passes run concurrently unless RESUME_LLM_CONCURRENT is disabled. A
+    failed or timed-out verifier pass is returned as None; a failed
+    primary pass is retried once on its own so the verifier output is kept. A
+    primary pass that is only slow is waited on for one more timeout rather
+    than sent again, so it is not paid for twice.
+    """
+    if not LLM_CONCURRENT_PASSES:
+        primary = run_llm_json(client, base_prompt, timeout=LLM_CALL_TIMEOUT)
+        try:
+            verifier = run_llm_json(client, verifier_prompt, LLM_CALL_TIMEOUT, "verifier_prompt")
+        except Exception as exc:
+            print(f"Verifier pass failed, using primary pass only: {exc}")
+            verifier = None
+        return primary, verifier
+
+    primary_call = LLMCall(run_llm_json, client, base_prompt, LLM_CALL_TIMEOUT)
+    verifier_call = LLMCall(run_llm_json, client, verifier_prompt, LLM_CALL_TIMEOUT, "verifier_prompt")
+
+    try:
+        verifier = verifier_call.result(LLM_CALL_TIMEOUT)
+    except Exception as exc:
+        print(f"Verifier pass failed, using primary pass only: {exc}")
+        verifier = None
+
+    try:
+        primary = primary_call.result(LLM_CALL_TIMEOUT)
+    except FutureTimeoutError:
+        print(f"Primary pass still running after {LLM_CALL_TIMEOUT}s, waiting for it instead of retrying")
+        primary = primary_call.result(2 * LLM_CALL_TIMEOUT)
+    except Exception as exc:
+        print(f"Primary pass failed, retrying without verifier: {exc}")
+        primary = run_llm_json(client, base_prompt, timeout=LLM_CALL_TIMEOUT)
+
+    return primary, verifier
+
+
+def extract_resume_info(file_path, mode=None):
     """Extract resume information using OpenAI API."""
-    text = extract_text_from_file(file_path)
+    return extract_resume_info_from_text(extract_text_from_file(file_path), mode)
+
+
+@tracer.wrap("resume.extract_fields")
+def extract_resume_info_from_text(text, mode=None):
+    """Extract resume information from already extracted resume text.
+
+    ``mode`` is ``single`` or ``dual`` and defaults to RESUME_EXTRACTION_MODE;
+    the mode used is returned as ``extraction_mode`` and the cache digest of
+    the text as ``text_sha256`` (see ExtractionCache.forget).
+    """
     if not text:
         raise ResumeExtractionError("unable to read text from the uploaded resume")
 
+    mode = mode or RESUME_EXTRACTION_MODE
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"unknown extraction mode {mode!r}")
+
+    tracer.current_span().set_attribute("mode", mode)
+    normalized = normalize_text(text)
+    cache_key = ExtractionCache.make_key(normalized, mode)
+    text_sha256 = ExtractionCache.text_digest(normalized)
+    if extraction_cache:
+        with tracer.span("resume.cache_lookup") as span:
+            cached = extraction_cache.get(cache_key)
+            span.set_attribute("hit", bool(cached))
+        if cached:
+            cached["text_sha256"] = text_sha256
+            return cached
+
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ResumeExtractionError("OpenAI API key is not configured")
 
     client = OpenAI(api_key=api_key)
 
+    pages = strip_boilerplate(text.split(PAGE_BREAK))
+    cleaned = "\n".join(page for page in pages if page)
+    local = pre_extract(cleaned)
+    local_fields = {}
+    if local["emails"]:
+        local_fields["email"] = local["emails"][0]
+    if local["phones"]:
+        local_fields["phone"] = local["phones"][0]
+    fields = [field for field in RESUME_FIELDS if field not in local_fields]
+    chunks = split_into_chunks(pages)
+    if len(chunks) > MAX_CHUNKS:
+        print(f"Resume split into {len(chunks)} chunks, extracting the first {MAX_CHUNKS}")
+        chunks = chunks[:MAX_CHUNKS]
+    tracer.current_span().set_attribute("chunks", len(chunks))
+    prompt_text = chunks[0]
+
+    field_lines = "\n".join(RESUME_FIELD_PROMPTS[field] for field in fields)
     base_prompt = f"""
 Extract and return a valid JSON object with EXACT keys:
-- name: string
-- email: string
-- phone: string
-- company: string (current/latest company)
-- designation: string (current/latest role title)
-- skills: array of strings (as exhaustive as possible, include all explicit technical/domain skills found)
-- company_history: array of objects with keys:
-  - company: string
-  - duration: string (preserve source format, e.g. "Jan 2022 - Present" or "02/2024 - 07/2025")
-  - is_current: boolean
+{field_lines}
 
 Rules:
 - Use ONLY resume evidence.
@@ -213,7 +935,7 @@ Rules:
 - If missing, use empty string / empty array.
 
 Resume text:
-{text}
+{prompt_text}
 """
 
     verifier_prompt = f"""
@@ -227,24 +949,57 @@ Rules:
 - If a duration includes Present/Current, set is_current=true for that company.
 
 Resume text:
-{text}
+{prompt_text}
 """
 
     try:
-        primary = run_llm_json(client, base_prompt)
-        verifier = run_llm_json(client, verifier_prompt)
+        # Later chunks only contribute skills and company_history; they run on the
+        # shared LLM pool while the first chunk is extracted in this thread.
+        chunk_calls = [
+            LLMCall(run_llm_structured, client, chunk_prompt(chunk), CHUNK_FIELDS, LLM_CALL_TIMEOUT, "chunk_prompt")
+            for chunk in chunks[1:]
+        ]
 
-        primary_skills = primary.get("skills") if isinstance(primary.get("skills"), list) else []
-        verifier_skills = verifier.get("skills") if isinstance(verifier.get("skills"), list) else []
-        skills = unique_keep_order(primary_skills + verifier_skills)
+        if mode == EXTRACTION_MODE_DUAL:
+            primary, verifier = run_llm_passes(client, base_prompt, verifier_prompt)
+        else:
+            primary, verifier = run_llm_single(client, base_prompt, fields), {}
+        if not isinstance(primary, dict):
+            raise ResumeExtractionError("OpenAI returned a non-object response for the resume")
+        # A result missing a chunk or the verifier pass is returned but not
+        # cached, so re-uploads get another chance at the full result.
+        complete = isinstance(verifier, dict)
+        if not complete:
+            verifier = {}
 
-        primary_history = primary.get("company_history") if isinstance(primary.get("company_history"), list) else []
-        verifier_history = verifier.get("company_history") if isinstance(verifier.get("company_history"), list) else []
-        company_history = sort_company_history(primary_history + verifier_history)
+        partials = [primary, verifier]
+        for index, call in enumerate(chunk_calls, start=2):
+            try:
+                partial = call.result(LLM_CALL_TIMEOUT)
+            except Exception as exc:
+                print(f"Resume chunk {index} extraction failed, skipping it: {exc}")
+                complete = False
+                continue
+            if isinstance(partial, dict):
+                partials.append(partial)
+
+        skills = unique_keep_order(
+            skill for partial in partials
+            for skill in (partial.get("skills") if isinstance(partial.get("skills"), list) else [])
+        )
+        company_history = snap_durations(
+            sort_company_history([
+                item for partial in partials
+                for item in (
+                    partial.get("company_history") if isinstance(partial.get("company_history"), list) else []
+                )
+            ]),
+            local["date_ranges"],
+        )
 
         name = normalize_text(primary.get("name", ""))
-        email = normalize_text(primary.get("email", ""))
-        phone = normalize_text(primary.get("phone", ""))
+        email = normalize_text(local_fields.get("email") or primary.get("email", ""))
+        phone = normalize_text(local_fields.get("phone") or primary.get("phone", ""))
         designation = normalize_text(primary.get("designation", ""))
         company = normalize_text(primary.get("company", ""))
 
@@ -258,7 +1013,7 @@ Resume text:
                 "resume content could not be parsed into required fields (name/email)"
             )
 
-        return {
+        result = {
             "name": name,
             "email": email,
             "phone": phone,
@@ -266,9 +1021,15 @@ Resume text:
             "designation": designation,
             "skills": skills,
             "company_history": company_history,
+            "extraction_mode": mode,
+            "text_sha256": text_sha256,
         }
     except ResumeExtractionError:
         raise
     except Exception as exc:
         print(f"Error with OpenAI API: {exc}")
         raise ResumeExtractionError(f"OpenAI extraction failed: {exc}") from exc
+
+    if extraction_cache and complete:
+        extraction_cache.put(cache_key, result)
+    return result
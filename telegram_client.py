@@ -0,0 +1,182 @@
+import hashlib
+import http.client
+import json
+import queue
+import time
+from urllib import parse as urllib_parse
+
+
+class TelegramAPIError(RuntimeError):
+    """Raised when the Bot API rejects a call or cannot be reached."""
+
+    def __init__(self, message, error_code=None, retry_after=None):
+        super().__init__(message)
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class TelegramFileTooLarge(TelegramAPIError):
+    """Raised when a downloaded file exceeds the configured size limit."""
+
+
+class TelegramClient:
+    """Telegram Bot API client that reuses keep-alive HTTP/1.1 connections.
+
+    Idle connections are kept in a pool of ``pool_size``; extra connections are
+    opened on demand and closed when the pool is full. Calls are retried with
+    exponential backoff on 5xx responses and connection drops, and on 429 after
+    the ``retry_after`` Telegram asks for.
+    """
+
+    def __init__(self, token, base_url='https://api.telegram.org', pool_size=4, timeout=20,
+                 max_retries=3, backoff=0.5, max_retry_after=30):
+        parsed = urllib_parse.urlsplit(base_url)
+        self.token = token
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _open(self, method, path, body=None, headers=None):
+        """Send a request and return ``(conn, response)`` with the body still unread.
+
+        A pooled connection the server already closed is retried once on a
+        fresh connection.
+        """
+        conn, reused = self._acquire()
+        try:
+            conn.request(method, self.base_path + path, body=body, headers=headers or {})
+            return conn, conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+        conn = self._new_connection()
+        try:
+            conn.request(method, self.base_path + path, body=body, headers=headers or {})
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def _finish(self, conn, response):
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+    def _request(self, method, path, body=None, headers=None):
+        conn, response = self._open(method, path, body, headers)
+        try:
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+        self._finish(conn, response)
+        return response.status, data
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        if retry_after is not None:
+            delay = min(float(retry_after), self.max_retry_after)
+        else:
+            delay = self.backoff * (2 ** attempt)
+        time.sleep(delay)
+
+    def call(self, method, payload=None):
+        body = urllib_parse.urlencode(payload or {}).encode('utf-8')
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        path = f'/bot{self.token}/{method}'
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                status, data = self._request('POST', path, body, headers)
+            except (http.client.HTTPException, ConnectionError) as exc:
+                if last_attempt:
+                    raise TelegramAPIError(f'Telegram API {method} failed: {exc}') from exc
+                self._sleep_before_retry(attempt)
+                continue
+            except OSError as exc:
+                # Timeouts are not retried: the request may already have been applied.
+                raise TelegramAPIError(f'Telegram API {method} failed: {exc}') from exc
+
+            try:
+                result = json.loads(data.decode('utf-8'))
+            except ValueError:
+                result = {'ok': False, 'description': f'Telegram API returned HTTP {status}'}
+            if result.get('ok'):
+                return result.get('result')
+
+            error_code = result.get('error_code', status)
+            retry_after = (result.get('parameters') or {}).get('retry_after')
+            description = result.get('description', 'Telegram API request failed')
+            if not last_attempt and (error_code == 429 or status >= 500):
+                self._sleep_before_retry(attempt, retry_after if error_code == 429 else None)
+                continue
+            raise TelegramAPIError(description, error_code=error_code, retry_after=retry_after)
+
+    def download_to(self, file_path, dest, max_bytes=None, chunk_size=64 * 1024):
+        """Stream a file reported by ``getFile`` into the binary file object ``dest``.
+
+        Returns ``(size, sha256_hexdigest)``. Raises TelegramFileTooLarge as soon
+        as the announced or received size passes ``max_bytes``.
+        """
+        conn, response = self._open('GET', f'/file/bot{self.token}/{file_path}')
+        try:
+            if response.status != 200:
+                raise TelegramAPIError(
+                    f'Telegram file download failed with HTTP {response.status}', error_code=response.status
+                )
+            length = response.getheader('Content-Length')
+            if max_bytes is not None and length and length.isdigit() and int(length) > max_bytes:
+                raise TelegramFileTooLarge(f'File is larger than {max_bytes} bytes')
+
+            digest = hashlib.sha256()
+            size = 0
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise TelegramFileTooLarge(f'File is larger than {max_bytes} bytes')
+                digest.update(chunk)
+                dest.write(chunk)
+        except Exception:
+            # The body may be partially unread, so this connection cannot be reused.
+            conn.close()
+            raise
+        self._finish(conn, response)
+        return size, digest.hexdigest()
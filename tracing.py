@@ -0,0 +1,177 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'attributes', 'status', '_started')
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self, duration):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(duration * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+class NonRecordingSpan:
+    """Stands in for spans of unsampled traces so their children are skipped too."""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class JsonlFileExporter:
+    """Appends one JSON object per finished span to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list; meant for tests and debugging."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+
+class Tracer:
+    """Minimal span tracer.
+
+    A trace is sampled when its root span starts, with probability
+    ``sample_ratio``; every span below it follows that decision. With no
+    exporter, or an unsampled trace, a span costs one context variable lookup.
+    """
+
+    def __init__(self, exporter=None, sample_ratio=1.0):
+        self.configure(exporter, sample_ratio)
+
+    def configure(self, exporter, sample_ratio=1.0):
+        self.exporter = exporter
+        self.sample_ratio = max(0.0, min(float(sample_ratio), 1.0))
+
+    def current_span(self):
+        """Innermost active span; a non-recording span when nothing is traced."""
+        return _current_span.get() or NON_RECORDING_SPAN
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        if parent is NON_RECORDING_SPAN or self.exporter is None:
+            yield NON_RECORDING_SPAN
+            return
+        if parent is None:
+            if random.random() >= self.sample_ratio:
+                token = _current_span.set(NON_RECORDING_SPAN)
+                try:
+                    yield NON_RECORDING_SPAN
+                finally:
+                    _current_span.reset(token)
+                return
+            span = Span(name, os.urandom(16).hex(), attributes=attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.status = 'error'
+            span.attributes['error'] = f'{type(exc).__name__}: {exc}'
+            raise
+        finally:
+            _current_span.reset(token)
+            self._export(span.to_dict(time.perf_counter() - span._started))
+
+    def _export(self, span):
+        try:
+            self.exporter.export(span)
+        except Exception as exc:
+            print(f'Span {span["name"]} could not be exported: {exc}')
+
+    def wrap(self, name):
+        """Decorator running the function inside a span called ``name``."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.exporter is None:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def bind_context(func):
+    """Return ``func`` carrying the current span into a thread pool task.
+
+    Executor threads do not inherit context variables, so spans started in a
+    submitted task would otherwise begin a new trace. Only the span is carried
+    over: the task runs in a fresh context so other context-local state, such
+    as Flask's request context, stays with the submitting thread.
+    """
+    span = _current_span.get()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        context = contextvars.Context()
+        if span is not None:
+            context.run(_current_span.set, span)
+        return context.run(func, *args, **kwargs)
+    return run
+
+
+def make_exporter(kind, path):
+    if kind == 'jsonl':
+        return JsonlFileExporter(path)
+    if kind == 'memory':
+        return InMemoryExporter()
+    if kind:
+        print(f'Unknown TRACE_EXPORTER {kind!r}, tracing disabled')
+    return None
+
+
+tracer = Tracer()